@@ -1,12 +1,45 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import httplib2
+import openpyxl
 import os
 import io
-import pickle
-from typing import List, Dict, Optional
+import json
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import BinaryIO, List, Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+def _q_escape(value: str) -> str:
+    """Escapa un valor para usarlo entre comillas simples en una query de Drive"""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+# CUIT dentro de un nombre de carpeta: 11 dígitos seguidos, con guiones/puntos opcionales
+# entre los grupos (XX-XXXXXXXX-X) y sin otros dígitos pegados antes o después
+_CUIT_IN_NAME_RX = re.compile(r'(?<!\d)(?<!\d[\-.])(\d{2})[\-.]?(\d{8})[\-.]?(\d)(?![\-.]?\d)')
+
+
+def _normalize_cuit(cuit: str) -> str:
+    """CUIT solo con dígitos ("20-12345678-9" -> "20123456789")"""
+    return re.sub(r'\D', '', str(cuit))
+
+
+def _cuits_in_name(name: str) -> set:
+    """CUITs (normalizados) que aparecen en un nombre de carpeta"""
+    return {''.join(match.groups()) for match in _CUIT_IN_NAME_RX.finditer(name)}
 
 
 class DriveHandler:
@@ -14,25 +47,203 @@ class DriveHandler:
     
     SCOPES = ['https://www.googleapis.com/auth/drive']
     ROOT_FOLDER_NAME = "Clientes Libros Iva"  # Carpeta de prueba
+    # Clientes que se listan como deshabilitados (nombres de carpeta, sin distinguir mayúsculas)
+    DISABLED_CLIENTS = frozenset()
+    CACHE_PATH = os.path.join(os.path.expanduser('~'), '.drive_handler_cache.json')
+    # Copias locales de los libros del año, indexadas por file_id y versión en Drive
+    # (por usuario y con permisos 0o700, como el cache de carpetas)
+    WORKBOOK_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.drive_handler_workbooks')
+    # Por debajo de este tamaño se sube en un solo request (multipart) en vez de resumable
+    RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+    # Chunks de las subidas resumables (múltiplo de 256KB): un corte reenvía como mucho un chunk
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
+    # Chunks grandes: un libro del año entra en uno o dos GET por rango
+    DOWNLOAD_CHUNK_SIZE = 20 * 1024 * 1024
+    # Carpetas por consulta en check_year_files_bulk (mantiene la query dentro del límite de Drive)
+    BULK_PARENTS_PER_QUERY = 50
+    # Hilos para llamadas independientes a Drive (limitadas por red, no por el GIL)
+    MAX_WORKERS = 8
+    # Reintentos con backoff exponencial + jitter de googleapiclient ante 429/5xx
+    NUM_RETRIES = 5
+    RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+    # authenticate() no vuelve a cargar ni refrescar el token hasta este margen antes de que venza
+    AUTH_REFRESH_MARGIN = 60
+    # Vigencia asumida cuando el token no informa su vencimiento
+    AUTH_DEFAULT_TTL = 300
     
-    def __init__(self, credentials_path: str = 'credentials.json', token_path: str = 'token.pickle'):
+    def __init__(self, credentials_path: str = 'credentials.json', token_path: str = 'token.json',
+                 cache_path: Optional[str] = CACHE_PATH, shared_drive: bool = False,
+                 workbook_cache_dir: Optional[str] = WORKBOOK_CACHE_DIR):
         self.credentials_path = credentials_path
         self.token_path = token_path
+        self.cache_path = cache_path
+        # Solo si la carpeta raíz está en una Unidad compartida hace falta supportsAllDrives
+        self.shared_drive = shared_drive
+        self._disabled = frozenset(name.lower() for name in self.DISABLED_CLIENTS)
         self.service = None
+        self.http = None
         self.root_folder_id = None
+        self._creds = None
+        # time.monotonic() en el que vence el token actual (0: hay que autenticar)
+        self._auth_expires_at = 0.0
+        self._executor = None
+        # httplib2 no es thread-safe: cada hilo usa su propia sesión persistente
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        # Cache de IDs de carpetas: (parent_id, nombre) -> id y "root_id/cliente" -> estructura
+        self._folder_cache = {}
+        self._structure_cache = self._load_structure_cache()
+        # file_id -> versión (md5Checksum o modifiedTime) de la copia local del libro
+        self.workbook_cache_dir = workbook_cache_dir
+        self._workbook_cache = self._load_workbook_cache()
+
+    def _load_structure_cache(self) -> Dict:
+        """Carga desde disco el cache de estructuras de clientes"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  Cache de carpetas inválido, se ignora: %s", e)
+            return {}
+
+    def _save_structure_cache(self):
+        """Persiste en disco el cache de estructuras de clientes"""
+        if not self.cache_path:
+            return
+        try:
+            with self._cache_lock, open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(dict(self._structure_cache), f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            logger.warning("⚠️  No se pudo guardar el cache de carpetas: %s", e)
+
+    def _workbook_cache_index_path(self) -> str:
+        return os.path.join(self.workbook_cache_dir, 'index.json')
+
+    def _load_workbook_cache(self) -> Dict:
+        """Carga el índice de copias locales de libros (sobrevive a reinicios)"""
+        if not self.workbook_cache_dir:
+            return {}
+        try:
+            with open(self._workbook_cache_index_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  Cache de libros inválido, se ignora: %s", e)
+            return {}
+
+    @staticmethod
+    def _version_key(metadata: Dict) -> Optional[str]:
+        """Versión de un archivo en Drive (los Google Sheets no tienen md5Checksum)"""
+        return metadata.get('md5Checksum') or metadata.get('modifiedTime')
+
+    def fetch_cached_workbook(self, file_id: str, output: Union[str, BinaryIO], metadata: Dict) -> bool:
+        """
+        Copia a output (ruta o buffer en memoria) la copia local del libro si sigue siendo
+        la versión de Drive
+        metadata: resultado de get_metadata
+        Returns: True si se usó la copia local (no hace falta descargar)
+        """
+        version = self._version_key(metadata)
+        if not self.workbook_cache_dir or not version:
+            return False
+        cached_path = os.path.join(self.workbook_cache_dir, f"{file_id}.xlsx")
+        with self._cache_lock:
+            entry = self._workbook_cache.get(file_id)
+            if not isinstance(entry, dict) or entry.get('version') != version:
+                return False
+            try:
+                with open(cached_path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return False
+            # El contenido tiene que ser el de Drive (o, sin md5Checksum, el que se guardó)
+            expected_md5 = metadata.get('md5Checksum') or entry.get('md5')
+            if hashlib.md5(data).hexdigest() != expected_md5:
+                logger.warning("⚠️  La copia local del libro %s no coincide con Drive, se descarta", file_id)
+                self._workbook_cache.pop(file_id, None)
+                return False
+            if isinstance(output, (str, os.PathLike)):
+                with open(output, 'wb') as f:
+                    f.write(data)
+            else:
+                output.write(data)
+                output.seek(0)
+        logger.debug("      🔹 Libro %s sin cambios en Drive, se usa la copia local", file_id)
+        return True
+
+    def store_cached_workbook(self, file_id: str, source: Union[str, BinaryIO], metadata: Dict):
+        """Guarda source (ruta o buffer en memoria) como copia local de la versión `metadata` del libro"""
+        version = self._version_key(metadata)
+        if not self.workbook_cache_dir or not version:
+            return
+        cached_path = os.path.join(self.workbook_cache_dir, f"{file_id}.xlsx")
+        try:
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, 'rb') as f:
+                    data = f.read()
+            else:
+                data = source.getbuffer()
+            md5 = hashlib.md5(data).hexdigest()
+            if metadata.get('md5Checksum') and metadata['md5Checksum'] != md5:
+                logger.warning("⚠️  El libro %s no coincide con el md5 de Drive, no se guarda la copia local", file_id)
+                return
+            os.makedirs(self.workbook_cache_dir, mode=0o700, exist_ok=True)
+            # Si la carpeta ya existía con otros permisos, se restringen al usuario
+            os.chmod(self.workbook_cache_dir, 0o700)
+            with self._cache_lock:
+                with open(cached_path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(cached_path + '.tmp', cached_path)
+                self._workbook_cache[file_id] = {'version': version, 'md5': md5}
+                with open(self._workbook_cache_index_path(), 'w', encoding='utf-8') as f:
+                    json.dump(self._workbook_cache, f)
+        except OSError as e:
+            logger.warning("⚠️  No se pudo guardar la copia local del libro: %s", e)
+
+    def invalidate_client_structure(self, client_name: str):
+        """Descarta los IDs cacheados de un cliente (p. ej. si Drive respondió 404)"""
+        structure = self._structure_cache.pop(f"{self.root_folder_id}/{client_name}", None)
+        self._folder_cache.pop((self.root_folder_id, client_name), None)
+        if structure:
+            self._folder_cache.pop((structure['client_id'], 'Ventas'), None)
+            self._folder_cache.pop((structure['client_id'], 'Compras'), None)
+            self._save_structure_cache()
+
+    def _thread_http(self) -> AuthorizedHttp:
+        """Sesión HTTP autorizada del hilo actual (se crea una vez por hilo y se reutiliza)"""
+        http = getattr(self._local, 'http', None)
+        if http is None or http.credentials is not self._creds:
+            # Una sesión por hilo: httplib2 mantiene abiertas las conexiones por host,
+            # así que las llamadas sucesivas reutilizan el mismo handshake TCP/TLS
+            http = AuthorizedHttp(self._creds, http=httplib2.Http(timeout=60))
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs) -> HttpRequest:
+        """requestBuilder del servicio: ejecuta cada request con la sesión del hilo que lo crea"""
+        return HttpRequest(self._thread_http(), *args, **kwargs)
         
     def authenticate(self):
-        """Autentica con Google Drive usando OAuth2"""
+        """
+        Autentica con Google Drive usando OAuth2
+        Si ya hay un servicio con un token vigente lo devuelve sin tocar el disco ni la red
+        """
+        if self.service is not None and time.monotonic() < self._auth_expires_at - self.AUTH_REFRESH_MARGIN:
+            return self.service
+        
         creds = None
         
-        # El archivo token.pickle almacena los tokens de acceso del usuario
+        # El archivo token.json almacena los tokens de acceso del usuario
+        # (JSON en lugar de pickle: más rápido de leer y no ejecuta código si está corrupto)
         if os.path.exists(self.token_path):
             try:
-                with open(self.token_path, 'rb') as token:
-                    creds = pickle.load(token)
+                creds = Credentials.from_authorized_user_file(self.token_path, self.SCOPES)
             except Exception as e:
-                print(f"⚠️  Error al cargar token: {str(e)}")
-                print(f"   Eliminando token corrupto...")
+                logger.warning("⚠️  Error al cargar token: %s", e)
+                logger.info("   Eliminando token corrupto...")
                 os.unlink(self.token_path)
                 creds = None
         
@@ -40,33 +251,47 @@ class DriveHandler:
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
                 try:
-                    print("🔄 Refrescando token expirado...")
+                    logger.info("🔄 Refrescando token expirado...")
                     creds.refresh(Request())
-                    print("✓ Token refrescado exitosamente")
+                    logger.info("✓ Token refrescado exitosamente")
                 except Exception as e:
-                    print(f"⚠️  Token expirado o revocado: {str(e)}")
-                    print(f"   Eliminando token y solicitando nueva autenticación...")
+                    logger.warning("⚠️  Token expirado o revocado: %s", e)
+                    logger.info("   Eliminando token y solicitando nueva autenticación...")
                     if os.path.exists(self.token_path):
                         os.unlink(self.token_path)
                     creds = None
             
             if not creds:
-                print("🔐 Iniciando proceso de autenticación...")
-                print("   Se abrirá tu navegador para autorizar el acceso...")
+                # Requiere acción del usuario: se informa aunque el log esté en WARNING
+                logger.warning("🔐 Iniciando proceso de autenticación...")
+                logger.warning("   Se abrirá tu navegador para autorizar el acceso...")
                 flow = InstalledAppFlow.from_client_secrets_file(
                     self.credentials_path, self.SCOPES)
                 creds = flow.run_local_server(port=0)
-                print("✓ Autenticación exitosa")
+                logger.info("✓ Autenticación exitosa")
             
             # Guardar las credenciales para la próxima ejecución
             try:
-                with open(self.token_path, 'wb') as token:
-                    pickle.dump(creds, token)
-                print(f"✓ Token guardado en {self.token_path}")
+                with open(self.token_path, 'w', encoding='utf-8') as token:
+                    token.write(creds.to_json())
+                logger.info("✓ Token guardado en %s", self.token_path)
             except Exception as e:
-                print(f"⚠️  No se pudo guardar el token: {str(e)}")
-        
-        self.service = build('drive', 'v3', credentials=creds)
+                logger.warning("⚠️  No se pudo guardar el token: %s", e)
+        
+        self._creds = creds
+        if creds.expiry is not None:
+            # expiry de google-auth es un datetime UTC *sin* zona horaria: se compara contra
+            # la hora UTC también sin zona (datetime.utcnow() está deprecado desde 3.12)
+            now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+            remaining = (creds.expiry - now_utc).total_seconds()
+        else:
+            remaining = self.AUTH_DEFAULT_TTL
+        self._auth_expires_at = time.monotonic() + remaining
+        self.http = self._thread_http()
+        self.service = build('drive', 'v3', http=self.http, requestBuilder=self._build_request,
+                             cache_discovery=False)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix='drive')
         return self.service
     
     def find_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
@@ -74,21 +299,33 @@ class DriveHandler:
         Busca una carpeta por nombre
         Returns: ID de la carpeta o None si no existe
         """
+        cache_key = (parent_id, folder_name)
+        if cache_key in self._folder_cache:
+            return self._folder_cache[cache_key]
+
         if not self.service:
             self.authenticate()
         
-        query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        # Predicados del más selectivo al menos selectivo: padre, tipo, nombre, papelera
+        query = f"mimeType='application/vnd.google-apps.folder' and name='{_q_escape(folder_name)}' and trashed=false"
         if parent_id:
-            query += f" and '{parent_id}' in parents"
+            query = f"'{parent_id}' in parents and {query}"
         
+        # Solo interesa la primera coincidencia
         results = self.service.files().list(
             q=query,
             spaces='drive',
-            fields='files(id, name)'
-        ).execute()
+            fields='files(id)',
+            pageSize=1
+        ).execute(num_retries=self.NUM_RETRIES)
         
         items = results.get('files', [])
-        return items[0]['id'] if items else None
+        if not items:
+            return None
+
+        # Solo se cachean los aciertos: una carpeta que no existe puede crearse después
+        self._folder_cache[cache_key] = items[0]['id']
+        return items[0]['id']
     
     def get_root_folder_id(self) -> str:
         """Obtiene el ID de la carpeta raíz 'Clientes libros iva'"""
@@ -113,25 +350,31 @@ class DriveHandler:
         
         query = f"'{root_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
         
-        results = self.service.files().list(
+        # Paginar con el máximo permitido por Drive (1000) para no truncar a 100 resultados
+        items = []
+        request = self.service.files().list(
             q=query,
             spaces='drive',
-            fields='files(id, name)',
-            orderBy='name'
-        ).execute()
-        
-        items = results.get('files', [])
+            fields='nextPageToken, files(id, name)',
+            orderBy='name',
+            pageSize=1000
+        )
+        while request is not None:
+            results = request.execute(num_retries=self.NUM_RETRIES)
+            items.extend(results.get('files', []))
+            request = self.service.files().list_next(request, results)
         
         # Filtrar el archivo "cuits" y agregar estado enabled
         clients = []
         for item in items:
-            if item['name'].lower() == 'cuits':
+            name_lower = item['name'].lower()
+            if name_lower == 'cuits':
                 continue
             
             clients.append({
                 'name': item['name'],
                 'id': item['id'],
-                'enabled': item['name'].lower() not in self.DISABLED_CLIENTS
+                'enabled': name_lower not in self._disabled
             })
         
         return clients
@@ -145,75 +388,103 @@ class DriveHandler:
             self.authenticate()
         
         root_id = self.get_root_folder_id()
+
+        cache_key = f"{root_id}/{client_name}"
+        if cache_key in self._structure_cache:
+            return dict(self._structure_cache[cache_key])
+
         client_id = self.find_folder(client_name, root_id)
         
         if not client_id:
             raise Exception(f"No se encontró el cliente '{client_name}'")
-        
-        ventas_id = self.find_folder("Ventas", client_id)
-        compras_id = self.find_folder("Compras", client_id)
-        
-        return {
+
+        # Buscar Ventas y Compras en una sola consulta
+        query = (
+            f"'{client_id}' in parents and mimeType='application/vnd.google-apps.folder' "
+            f"and (name='Ventas' or name='Compras') and trashed=false"
+        )
+
+        results = self.service.files().list(
+            q=query,
+            spaces='drive',
+            fields='files(id, name)'
+        ).execute(num_retries=self.NUM_RETRIES)
+
+        folders = {}
+        for item in results.get('files', []):
+            folders.setdefault(item['name'], item['id'])
+
+        ventas_id = folders.get('Ventas')
+        compras_id = folders.get('Compras')
+
+        structure = {
             'client_id': client_id,
             'ventas_id': ventas_id,
             'compras_id': compras_id
         }
 
+        # Solo se cachea la estructura completa
+        if ventas_id and compras_id:
+            self._structure_cache[cache_key] = structure
+            self._save_structure_cache()
+
+        return dict(structure)
+
     def create_year_file(self, client_name: str, tipo: str, year: int) -> str:
         """
         Crea un nuevo archivo Excel vacío para el año
         Returns: file_id del archivo creado
         """
-        import openpyxl
-        import tempfile
-
-        print(f"   📝 Obteniendo estructura del cliente '{client_name}'...")
+        logger.info("   📝 Obteniendo estructura del cliente '%s'...", client_name)
         structure = self.get_client_structure(client_name)
         folder_id = structure['ventas_id'] if tipo.lower() == 'ventas' else structure['compras_id']
 
         if not folder_id:
             raise Exception(f"No se encontró la carpeta '{tipo}' para el cliente '{client_name}'")
 
-        print(f"   📝 Carpeta {tipo}: {folder_id}")
+        logger.info("   📝 Carpeta %s: %s", tipo, folder_id)
 
         # Formato: "Libro IVA Ventas 2025 Cliente"
         filename = f"Libro Iva {tipo.capitalize()} {year} {client_name}.xlsx"
 
         # Crear un Excel vacío temporal
-        print(f"   📝 Creando archivo Excel vacío...")
-        wb = openpyxl.Workbook()
-
-        # Eliminar TODAS las hojas por defecto
-        for sheet in wb.worksheets:
-            wb.remove(sheet)
+        logger.info("   📝 Creando archivo Excel vacío...")
+        # Modo write_only: escribe el XML en streaming y no crea hojas por defecto
+        wb = openpyxl.Workbook(write_only=True)
 
         # Crear una hoja temporal (se eliminará cuando se agregue la primera pestaña real)
         ws = wb.create_sheet(title="_temp")
-        ws['A1'] = "Archivo temporal - Esta pestaña se eliminará al agregar datos"
-
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp_path = tmp.name
+        ws.append(["Archivo temporal - Esta pestaña se eliminará al agregar datos"])
 
-        print(f"   📝 Guardando en temporal: {tmp_path}")
-        wb.save(tmp_path)
+        # Guardar en memoria (el archivo vacío pesa pocos KB, no hace falta pasar por disco)
+        buffer = io.BytesIO()
+        wb.save(buffer)
 
         # Subir a Drive
-        print(f"   📝 Subiendo '{filename}' a Drive...")
-        file_id = self.upload_file(tmp_path, folder_id, filename)
-
-        # Limpiar archivo temporal
-        import os
-        os.unlink(tmp_path)
+        logger.info("   📝 Subiendo '%s' a Drive...", filename)
+        try:
+            file_id = self.upload_file(buffer, folder_id, filename)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            # El ID cacheado de la carpeta ya no existe: resolver de nuevo y reintentar
+            logger.warning("   ⚠️  Carpeta %s no encontrada, actualizando cache...", folder_id)
+            self.invalidate_client_structure(client_name)
+            structure = self.get_client_structure(client_name)
+            folder_id = structure['ventas_id'] if tipo.lower() == 'ventas' else structure['compras_id']
+            if not folder_id:
+                raise Exception(f"No se encontró la carpeta '{tipo}' para el cliente '{client_name}'")
+            file_id = self.upload_file(buffer, folder_id, filename)
 
-        print(f"   ✅ Archivo creado exitosamente con ID: {file_id}")
+        logger.info("   ✅ Archivo creado exitosamente con ID: %s", file_id)
 
         return file_id
 
-    def check_year_file_exists(self, client_name: str, tipo: str, year: int) -> Dict:
+    def check_year_file_exists(self, client_name: str, tipo: str, year: int, _retry_stale: bool = True) -> Dict:
         """
         Verifica si existe el archivo del año
-        Returns: {exists: bool, file_id: str or None}
+        Returns: {exists: bool, file_id: str or None, mime_type: str or None, folder_id, filename,
+                  metadata: dict or None (mismos campos que get_metadata)}
         """
         structure = self.get_client_structure(client_name)
         folder_id = structure['ventas_id'] if tipo.lower() == 'ventas' else structure['compras_id']
@@ -224,75 +495,270 @@ class DriveHandler:
         # Formato: "Libro IVA Ventas 2025 Cliente"
         filename = f"Libro Iva {tipo.capitalize()} {year} {client_name}.xlsx"
         
-        print(f"   🔎 Buscando archivo: '{filename}'")
-        print(f"   🔎 En carpeta: {folder_id}")
+        logger.debug("   🔎 Buscando archivo: '%s'", filename)
+        logger.debug("   🔎 En carpeta: %s", folder_id)
         
-        # Escapar comillas simples en el nombre del archivo para la query
-        filename_escaped = filename.replace("'", "\\'")
-        query = f"name='{filename_escaped}' and '{folder_id}' in parents and trashed=false"
+        query = f"'{folder_id}' in parents and name='{_q_escape(filename)}' and trashed=false"
         
-        print(f"   🔎 Query: {query}")
+        logger.debug("   🔎 Query: %s", query)
         
-        results = self.service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name)'
-        ).execute()
+        try:
+            results = self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields='files(id, name, mimeType, md5Checksum, modifiedTime, size)'
+            ).execute(num_retries=self.NUM_RETRIES)
+        except HttpError as e:
+            if e.resp.status != 404 or not _retry_stale:
+                raise
+            # El ID cacheado de la carpeta ya no existe: resolver de nuevo y reintentar
+            logger.warning("   ⚠️  Carpeta %s no encontrada, actualizando cache...", folder_id)
+            self.invalidate_client_structure(client_name)
+            return self.check_year_file_exists(client_name, tipo, year, _retry_stale=False)
         
         items = results.get('files', [])
         
-        print(f"   🔎 Archivos encontrados: {len(items)}")
+        logger.debug("   🔎 Archivos encontrados: %s", len(items))
         if items:
             for item in items:
-                print(f"      - {item['name']} (ID: {item['id']})")
+                logger.debug("      - %s (ID: %s)", item['name'], item['id'])
+        elif _retry_stale and not self._folder_is_live(folder_id):
+            # Drive no responde 404 si el padre no existe: la lista simplemente viene vacía.
+            # Si la carpeta cacheada se borró o está en la papelera, resolver de nuevo y reintentar
+            logger.warning("   ⚠️  Carpeta %s eliminada, actualizando cache...", folder_id)
+            self.invalidate_client_structure(client_name)
+            return self.check_year_file_exists(client_name, tipo, year, _retry_stale=False)
         
         return {
             'exists': len(items) > 0,
             'file_id': items[0]['id'] if items else None,
+            'mime_type': items[0].get('mimeType') if items else None,
             'folder_id': folder_id,
-            'filename': filename
+            'filename': filename,
+            'metadata': items[0] if items else None
         }
+
+    def _folder_is_live(self, folder_id: str) -> bool:
+        """
+        Verifica que una carpeta (p. ej. un ID cacheado) siga existiendo fuera de la papelera
+        Returns: False si Drive responde 404 o la carpeta está en la papelera
+        """
+        try:
+            folder = self.service.files().get(
+                fileId=folder_id,
+                fields='id, trashed',
+                supportsAllDrives=self.shared_drive
+            ).execute(num_retries=self.NUM_RETRIES)
+        except HttpError as e:
+            if e.resp.status == 404:
+                return False
+            raise
+        return not folder.get('trashed', False)
+
+    def check_year_files_bulk(self, jobs: List[Tuple[str, str, int]],
+                              strict: bool = True) -> Dict[Tuple[str, str, int], Dict]:
+        """
+        Verifica de una sola vez si existen los archivos del año para varios (cliente, tipo, año)
+        Agrupa hasta BULK_PARENTS_PER_QUERY carpetas por consulta en lugar de una consulta por archivo
+        strict: si es False, un cliente sin carpeta en Drive (o sin Ventas/Compras) se
+                informa como inexistente (folder_id None, con el motivo en error) en vez
+                de cortar toda la consulta
+        Returns: {(cliente, tipo, año): {exists, file_id, mime_type, folder_id, filename, metadata,
+                  error: str or None}}
+        """
+        if not self.service:
+            self.authenticate()
+
+        # Resolver en paralelo las estructuras de los clientes (las que no están en cache
+        # cuestan dos consultas cada una y son independientes entre sí)
+        self.get_root_folder_id()
+        client_names = list(dict.fromkeys(client_name for client_name, _, _ in jobs))
+        resolve = self.get_client_structure if strict else self._client_structure_or_error
+        structures = dict(zip(client_names, self._executor.map(resolve, client_names)))
+
+        # Carpetas y nombres esperados
+        targets = {}
+        errors = {}
+        for client_name, tipo, year in jobs:
+            structure = structures[client_name]
+            job = (client_name, tipo, year)
+            # Formato: "Libro IVA Ventas 2025 Cliente"
+            filename = f"Libro Iva {tipo.capitalize()} {year} {client_name}.xlsx"
+
+            if isinstance(structure, Exception):
+                targets[job] = (None, filename)
+                errors[job] = str(structure)
+                continue
+
+            folder_id = structure['ventas_id'] if tipo.lower() == 'ventas' else structure['compras_id']
+
+            if not folder_id:
+                message = f"No se encontró la carpeta '{tipo}' para el cliente '{client_name}'"
+                if strict:
+                    raise Exception(message)
+                errors[job] = message
+
+            targets[job] = (folder_id, filename)
+
+        found = {}
+        pending = list(dict.fromkeys(target for target in targets.values() if target[0]))
+        logger.debug("   🔎 Buscando %s archivos en Drive...", len(pending))
+
+        for start in range(0, len(pending), self.BULK_PARENTS_PER_QUERY):
+            group = pending[start:start + self.BULK_PARENTS_PER_QUERY]
+            parents_q = ' or '.join(sorted({f"'{folder_id}' in parents" for folder_id, _ in group}))
+            names_q = ' or '.join(sorted({
+                f"name='{_q_escape(filename)}'" for _, filename in group
+            }))
+            query = f"({parents_q}) and ({names_q}) and trashed=false"
+
+            request = self.service.files().list(
+                q=query,
+                spaces='drive',
+                fields='nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime, size, parents)',
+                pageSize=1000
+            )
+            while request is not None:
+                results = request.execute(num_retries=self.NUM_RETRIES)
+                for item in results.get('files', []):
+                    for parent in item.get('parents', []):
+                        found.setdefault((parent, item['name']), item)
+                request = self.service.files().list_next(request, results)
+
+        logger.debug("   🔎 Archivos encontrados: %s", len(set(found) & set(pending)))
+
+        results = {}
+        for job, (folder_id, filename) in targets.items():
+            item = found.get((folder_id, filename))
+            results[job] = {
+                'exists': item is not None,
+                'file_id': item['id'] if item else None,
+                'mime_type': item.get('mimeType') if item else None,
+                'folder_id': folder_id,
+                'filename': filename,
+                'metadata': item,
+                'error': errors.get(job)
+            }
+        return results
+
+    def _client_structure_or_error(self, client_name: str):
+        """
+        get_client_structure sin cortar una consulta de varios clientes
+        Returns: la estructura, o la excepción si el cliente no se pudo resolver
+        """
+        try:
+            return self.get_client_structure(client_name)
+        except Exception as e:
+            logger.warning("   ⚠️  %s", e)
+            return e
     
-    def download_file(self, file_id: str, output_path: str):
-        """Descarga un archivo de Drive"""
+    def get_metadata(self, file_id: str) -> Dict:
+        """
+        Metadatos livianos de un archivo (alcanzan para saber si cambió en Drive)
+        Returns: {id, mimeType, md5Checksum, modifiedTime, size}
+        """
+        if not self.service:
+            self.authenticate()
+        return self.service.files().get(
+            fileId=file_id,
+            fields='id, mimeType, md5Checksum, modifiedTime, size',
+            supportsAllDrives=self.shared_drive
+        ).execute(num_retries=self.NUM_RETRIES)
+
+    def download_file(self, file_id: str, output_path: str, mime_type: Optional[str] = None):
+        """
+        Descarga un archivo de Drive
+        mime_type: si el llamador ya lo conoce (p. ej. de check_year_file_exists) se evita consultarlo
+        """
+        with io.FileIO(output_path, 'wb') as fh:
+            self._download_into(fh, file_id, mime_type)
+    
+    def download_to_bytesio(self, file_id: str, mime_type: Optional[str] = None) -> io.BytesIO:
+        """
+        Descarga un archivo de Drive a memoria (sin pasar por disco)
+        Returns: buffer posicionado al principio
+        """
+        buffer = io.BytesIO()
+        self._download_into(buffer, file_id, mime_type)
+        buffer.seek(0)
+        return buffer
+    
+    def _download_into(self, fh: BinaryIO, file_id: str, mime_type: Optional[str] = None):
+        """Descarga (o exporta, si es Google Sheets) el archivo y lo escribe en fh"""
         if not self.service:
             self.authenticate()
         
-        # Primero verificar el tipo de archivo
-        file_metadata = self.service.files().get(fileId=file_id, fields='mimeType, name').execute()
-        mime_type = file_metadata.get('mimeType')
+        # Verificar el tipo de archivo solo si no lo recibimos
+        if mime_type is None:
+            file_metadata = self.service.files().get(fileId=file_id, fields='mimeType').execute(num_retries=self.NUM_RETRIES)
+            mime_type = file_metadata.get('mimeType')
         
-        print(f"      🔹 Tipo de archivo: {mime_type}")
+        logger.debug("      🔹 Tipo de archivo: %s", mime_type)
         
         # Si es Google Sheets, exportar como Excel
         if mime_type == 'application/vnd.google-apps.spreadsheet':
-            print(f"      🔹 Exportando Google Sheets como Excel...")
+            logger.debug("      🔹 Exportando Google Sheets como Excel...")
             request = self.service.files().export_media(
                 fileId=file_id,
                 mimeType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             )
         else:
             # Es un archivo Excel normal
-            print(f"      🔹 Descargando archivo Excel...")
+            logger.debug("      🔹 Descargando archivo Excel...")
             request = self.service.files().get_media(fileId=file_id)
         
-        with io.FileIO(output_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-                if status:
-                    print(f"      🔹 Progreso: {int(status.progress() * 100)}%")
+        downloader = MediaIoBaseDownload(fh, request, chunksize=self.DOWNLOAD_CHUNK_SIZE)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk(num_retries=self.NUM_RETRIES)
+            # Solo informar progreso en descargas de varios chunks
+            if status and not done:
+                logger.debug("      🔹 Progreso: %s%%", int(status.progress() * 100))
+    
+    def _excel_media(self, source: Union[str, BinaryIO]):
+        """Cuerpo de subida para un Excel en disco (ruta) o en memoria (buffer)"""
+        if isinstance(source, (str, os.PathLike)):
+            return MediaFileUpload(
+                source,
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                chunksize=self.UPLOAD_CHUNK_SIZE,
+                resumable=os.path.getsize(source) >= self.RESUMABLE_THRESHOLD
+            )
+        size = source.seek(0, io.SEEK_END)
+        source.seek(0)
+        return MediaIoBaseUpload(
+            source,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            chunksize=self.UPLOAD_CHUNK_SIZE,
+            resumable=size >= self.RESUMABLE_THRESHOLD
+        )
+    
+    def _execute_upload(self, request: HttpRequest) -> Dict:
+        """
+        Ejecuta un create/update con archivo adjunto
+        Si la subida es resumable va chunk por chunk: cada chunk se reintenta por separado
+        (backoff exponencial ante 429/5xx), así un corte no obliga a reenviar todo el archivo
+        """
+        if request.resumable is None:
+            return request.execute(num_retries=self.NUM_RETRIES)
+        
+        response = None
+        while response is None:
+            status, response = request.next_chunk(num_retries=self.NUM_RETRIES)
+            if status and response is None:
+                logger.debug("      🔹 Subida: %s%%", int(status.progress() * 100))
+        return response
     
-    def upload_file(self, file_path: str, folder_id: str, file_name: str) -> str:
+    def upload_file(self, source: Union[str, BinaryIO], folder_id: str, file_name: str) -> str:
         """
         Sube un archivo a Drive como Excel (NO como Google Sheets)
+        source: ruta del archivo o buffer en memoria (p. ej. io.BytesIO)
         Returns: ID del archivo subido
         """
         if not self.service:
             self.authenticate()
         
-        print(f"      🔹 Preparando subida de '{file_name}' a carpeta {folder_id}")
+        logger.debug("      🔹 Preparando subida de '%s' a carpeta %s", file_name, folder_id)
         
         file_metadata = {
             'name': file_name,
@@ -300,74 +766,84 @@ class DriveHandler:
             # NO incluir mimeType en metadata para que mantenga el formato Excel
         }
         
-        media = MediaFileUpload(
-            file_path,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            resumable=True
-        )
+        media = self._excel_media(source)
         
-        print(f"      🔹 Subiendo archivo como Excel binario (NO Google Sheets)...")
-        file = self.service.files().create(
+        logger.debug("      🔹 Subiendo archivo como Excel binario (NO Google Sheets)...")
+        file = self._execute_upload(self.service.files().create(
             body=file_metadata,
             media_body=media,
-            fields='id, name, mimeType, parents',
-            supportsAllDrives=True
-        ).execute()
+            fields='id',
+            supportsAllDrives=self.shared_drive
+        ))
         
         file_id = file.get('id')
-        mime_type = file.get('mimeType')
-        print(f"      ✅ Archivo subido: {file.get('name')}")
-        print(f"      ✅ Tipo MIME: {mime_type}")
-        print(f"      ✅ ID: {file_id}")
+        logger.info("      ✅ Archivo subido: %s (ID: %s)", file_name, file_id)
         
         return file_id
 
-    def update_file(self, file_id: str, file_path: str):
-        """Actualiza un archivo existente en Drive"""
+    def update_file(self, file_id: str, file_path: Union[str, BinaryIO], fields: str = 'id',
+                    mime_type: Optional[str] = None):
+        """
+        Actualiza un archivo existente en Drive
+        file_path: ruta del archivo o buffer en memoria (p. ej. io.BytesIO)
+        fields: campos a pedir en la respuesta de la actualización (p. ej. 'id, modifiedTime');
+                si incluye md5Checksum o modifiedTime, file_path queda como copia local
+                de la nueva versión (ver fetch_cached_workbook)
+        mime_type: tipo actual si el llamador ya lo conoce (evita consultarlo)
+        """
         if not self.service:
             self.authenticate()
 
-        # Verificar tipo de archivo actual
-        file_metadata = self.service.files().get(fileId=file_id, fields='mimeType, name').execute()
-        current_mime = file_metadata.get('mimeType')
+        file_info = None
+        current_mime = mime_type
+        if current_mime is None:
+            # Verificar tipo de archivo actual (y de paso nombre y carpeta, por si hay que reemplazarlo)
+            file_info = self.service.files().get(
+                fileId=file_id,
+                fields='mimeType, name, parents'
+            ).execute(num_retries=self.NUM_RETRIES)
+            current_mime = file_info.get('mimeType')
 
-        print(f"      🔹 Actualizando archivo {file_id}...")
-        print(f"      🔹 Tipo actual: {current_mime}")
+        logger.debug("      🔹 Actualizando archivo %s...", file_id)
+        logger.debug("      🔹 Tipo actual: %s", current_mime)
 
         # Si el archivo actual es Google Sheets, necesitamos eliminarlo y crear uno nuevo
         if current_mime == 'application/vnd.google-apps.spreadsheet':
-            print(f"      ⚠️  Archivo actual es Google Sheets, será reemplazado por Excel...")
-            # Obtener info del archivo
-            file_info = self.service.files().get(fileId=file_id, fields='name, parents').execute()
+            logger.warning("      ⚠️  Archivo actual es Google Sheets, será reemplazado por Excel...")
+            if file_info is None:
+                file_info = self.service.files().get(
+                    fileId=file_id,
+                    fields='name, parents'
+                ).execute(num_retries=self.NUM_RETRIES)
             file_name = file_info.get('name')
             parents = file_info.get('parents', [])
 
-            # Eliminar el Google Sheets
-            self.service.files().delete(fileId=file_id).execute()
-            print(f"      🔹 Google Sheets eliminado")
+            if not parents:
+                raise Exception(f"No se pudo determinar la carpeta del archivo '{file_name}'")
+
+            # Subir primero el nuevo Excel y recién después eliminar el Google Sheets,
+            # así un fallo en la subida no deja al cliente sin su libro
+            new_file_id = self.upload_file(file_path, parents[0], file_name)
+            logger.info("      ✅ Nuevo archivo Excel creado con ID: %s", new_file_id)
 
-            # Subir el nuevo Excel
-            if parents:
-                new_file_id = self.upload_file(file_path, parents[0], file_name)
-                print(f"      ✅ Nuevo archivo Excel creado con ID: {new_file_id}")
-                return new_file_id
+            self.service.files().delete(fileId=file_id).execute(num_retries=self.NUM_RETRIES)
+            logger.debug("      🔹 Google Sheets eliminado")
+            return new_file_id
         else:
             # Es Excel, actualizar normalmente
-            media = MediaFileUpload(
-                file_path,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                resumable=True
-            )
+            media = self._excel_media(file_path)
 
-            updated_file = self.service.files().update(
+            updated_file = self._execute_upload(self.service.files().update(
                 fileId=file_id,
                 media_body=media,
-                fields='id, name, mimeType, modifiedTime'
-            ).execute()
+                fields=fields,
+                supportsAllDrives=self.shared_drive
+            ))
 
-            print(f"      ✅ Archivo actualizado: {updated_file.get('name')}")
-            print(f"      ✅ Tipo: {updated_file.get('mimeType')}")
-            print(f"      ✅ Modificado: {updated_file.get('modifiedTime')}")
+            logger.info("      ✅ Archivo actualizado: %s", file_id)
+            if updated_file.get('modifiedTime'):
+                logger.info("      ✅ Modificado: %s", updated_file['modifiedTime'])
+            self.store_cached_workbook(file_id, file_path, updated_file)
             return file_id
     
     def create_client(self, client_name: str, cuit: str) -> Dict:
@@ -380,7 +856,7 @@ class DriveHandler:
         
         root_id = self.get_root_folder_id()
         
-        print(f"   📝 Creando cliente '{client_name}' (CUIT: {cuit})...")
+        logger.info("   📝 Creando cliente '%s' (CUIT: %s)...", client_name, cuit)
         
         # Verificar si ya existe
         existing = self.find_folder(client_name, root_id)
@@ -399,116 +875,100 @@ class DriveHandler:
         
         client_folder = self.service.files().create(
             body=client_metadata,
-            fields='id, name'
-        ).execute()
+            fields='id'
+        ).execute(num_retries=self.NUM_RETRIES)
         
         client_id = client_folder.get('id')
-        print(f"   ✓ Carpeta cliente creada: {client_id}")
+        logger.info("   ✓ Carpeta cliente creada: %s", client_id)
         
-        # Crear carpeta Ventas
-        ventas_metadata = {
-            'name': 'Ventas',
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [client_id]
+        # Crear carpetas Ventas y Compras en un único batch (comparten el mismo padre)
+        created = {}
+        errors = {}
+
+        def on_created(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                created[request_id] = response.get('id')
+
+        folders_metadata = {
+            folder_name.lower(): {
+                'name': folder_name,
+                'mimeType': 'application/vnd.google-apps.folder',
+                'parents': [client_id]
+            }
+            for folder_name in ('Ventas', 'Compras')
         }
-        
-        ventas_folder = self.service.files().create(
-            body=ventas_metadata,
-            fields='id, name'
-        ).execute()
-        
-        print(f"   ✓ Carpeta Ventas creada: {ventas_folder.get('id')}")
-        
-        # Crear carpeta Compras
-        compras_metadata = {
-            'name': 'Compras',
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [client_id]
+
+        batch = self.service.new_batch_http_request(callback=on_created)
+        for request_id, folder_metadata in folders_metadata.items():
+            batch.add(
+                self.service.files().create(body=folder_metadata, fields='id'),
+                request_id=request_id
+            )
+        batch.execute()
+
+        # El batch no reintenta sus partes: repetir individualmente las que fallaron
+        # por límite de cuota o error del servidor (execute aplica el backoff)
+        for request_id, exception in list(errors.items()):
+            if isinstance(exception, HttpError) and exception.resp.status in self.RETRYABLE_STATUSES:
+                logger.warning("   ⚠️  Reintentando carpeta '%s' (HTTP %s)...", request_id, exception.resp.status)
+                folder = self.service.files().create(
+                    body=folders_metadata[request_id],
+                    fields='id'
+                ).execute(num_retries=self.NUM_RETRIES)
+                created[request_id] = folder.get('id')
+                del errors[request_id]
+
+        if errors:
+            failed = ', '.join(sorted(errors))
+            raise Exception(f"No se pudieron crear las carpetas ({failed}) del cliente '{client_name}': {errors}")
+
+        logger.info("   ✓ Carpeta Ventas creada: %s", created['ventas'])
+        logger.info("   ✓ Carpeta Compras creada: %s", created['compras'])
+
+        # Recordar los IDs recién creados para no volver a buscarlos
+        self._folder_cache[(root_id, client_name)] = client_id
+        self._structure_cache[f"{root_id}/{client_name}"] = {
+            'client_id': client_id,
+            'ventas_id': created['ventas'],
+            'compras_id': created['compras']
         }
-        
-        compras_folder = self.service.files().create(
-            body=compras_metadata,
-            fields='id, name'
-        ).execute()
-        
-        print(f"   ✓ Carpeta Compras creada: {compras_folder.get('id')}")
-        
+        self._save_structure_cache()
+
         return {
             'success': True,
             'client_id': client_id,
-            'ventas_id': ventas_folder.get('id'),
-            'compras_id': compras_folder.get('id'),
+            'ventas_id': created['ventas'],
+            'compras_id': created['compras'],
             'message': f"Cliente '{client_name}' creado exitosamente"
         }
     
     def find_client_by_cuit(self, cuit: str) -> Dict:
         """
-        Busca un cliente por su CUIT
-        Returns: {found: bool, client_name: str or None}
+        Busca un cliente por su CUIT en el nombre de su carpeta
+        Regla: el CUIT se compara completo (11 dígitos) contra cada secuencia de 11 dígitos
+        del nombre, ignorando guiones y puntos, así "20123456789", "20-12345678-9" y
+        "20.12345678.9" son el mismo CUIT; un prefijo o un CUIT más largo no coinciden.
+        El filtro es local: "name contains" de Drive compara por prefijo de palabra y no
+        encuentra "20123456789" dentro de "20-12345678-9 Acme"
+        Returns: {found: bool, client_name: str or None, client_id: str or None, cuit: str}
         """
-        # Por ahora buscaremos en el nombre de las carpetas
-        # Podrías mejorar esto guardando los CUIT en algún archivo de metadata
-        clients = self.list_clients()
-        
-        # Buscar si algún cliente tiene el CUIT en su nombre o descripción
-        # Por simplicidad, retornamos None por ahora
-        # La idea es que guardes un mapeo CUIT -> Nombre en algún lugar
-        
+        wanted = _normalize_cuit(cuit)
+
+        matches = []
+        if len(wanted) == 11:
+            matches = [client for client in self.list_clients() if wanted in _cuits_in_name(client['name'])]
+        if len(matches) > 1:
+            logger.warning("   ⚠️  Hay %s carpetas con el CUIT %s, se usa '%s'",
+                           len(matches), wanted, matches[0]['name'])
+
         return {
-            'found': False,
-            'client_name': None,
+            'found': len(matches) > 0,
+            'client_name': matches[0]['name'] if matches else None,
+            'client_id': matches[0]['id'] if matches else None,
             'cuit': cuit
         }
-        """
-        Crea un nuevo archivo Excel vacío para el año
-        Returns: file_id del archivo creado
-        """
-        import openpyxl
-        import tempfile
-        
-        print(f"   📝 Obteniendo estructura del cliente '{client_name}'...")
-        structure = self.get_client_structure(client_name)
-        folder_id = structure['ventas_id'] if tipo.lower() == 'ventas' else structure['compras_id']
-        
-        if not folder_id:
-            raise Exception(f"No se encontró la carpeta '{tipo}' para el cliente '{client_name}'")
-        
-        print(f"   📝 Carpeta {tipo}: {folder_id}")
-        
-        # Formato: "Libro IVA Ventas 2025 Cliente"
-        filename = f"Libro Iva {tipo.capitalize()} {year} {client_name}.xlsx"
-        
-        # Crear un Excel vacío temporal
-        print(f"   📝 Creando archivo Excel vacío...")
-        wb = openpyxl.Workbook()
-        
-        # Eliminar TODAS las hojas por defecto
-        for sheet in wb.worksheets:
-            wb.remove(sheet)
-        
-        # Crear una hoja temporal (se eliminará cuando se agregue la primera pestaña real)
-        ws = wb.create_sheet(title="_temp")
-        ws['A1'] = "Archivo temporal - Esta pestaña se eliminará al agregar datos"
-        
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp_path = tmp.name
-        
-        print(f"   📝 Guardando en temporal: {tmp_path}")
-        wb.save(tmp_path)
-        
-        # Subir a Drive
-        print(f"   📝 Subiendo '{filename}' a Drive...")
-        file_id = self.upload_file(tmp_path, folder_id, filename)
-        
-        # Limpiar archivo temporal
-        import os
-        os.unlink(tmp_path)
-        
-        print(f"   ✅ Archivo creado exitosamente con ID: {file_id}")
-        
-        return file_id
-
 
 def test_connection():
     """Función de prueba para verificar la conexión"""
@@ -1,9 +1,425 @@
+import io
+import os
+import re
+import html
+import shutil
+import zipfile
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from typing import Dict, List, Tuple
+from datetime import date, datetime
+from typing import BinaryIO, Dict, List, Tuple, Union
+from xml.sax.saxutils import escape as xml_escape
 import openpyxl
+from openpyxl.utils import get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Font, Alignment
+from pandas.io.parsers import TextParser
+
+try:
+    import xlsxwriter  # noqa: F401
+    _XLSX_ENGINE = 'xlsxwriter'
+except ImportError:
+    _XLSX_ENGINE = 'openpyxl'
+
+try:
+    from python_calamine import CalamineError, CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+    CalamineError = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Tipos de comprobante que son Notas de Crédito ("3 - Nota de Crédito A", "NC", etc.)
+_NOTA_CREDITO_RX = re.compile(r'nota de cr[eé]dito|nc', re.IGNORECASE)
+
+# CUIT en el encabezado: 11 dígitos después de "CUIT", o cualquier secuencia de 11 dígitos
+_CUIT_RX = re.compile(r'CUIT\s*[:\-]?\s*(\d{11})', re.IGNORECASE)
+_DIGITS11_RX = re.compile(r'\b(\d{11})\b')
+
+# Primera fila de sheet1.xml y sus celdas (para leer el encabezado sin abrir el libro)
+_ROW_RX = re.compile(rb'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.DOTALL)
+_CELL_RX = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.DOTALL)
+_CELL_REF_RX = re.compile(rb'\br="([A-Z]+)\d*"')
+_CELL_TYPE_RX = re.compile(rb'\bt="(\w+)"')
+_ROW_NUM_RX = re.compile(rb'\br="(\d+)"')
+_VALUE_RX = re.compile(rb'<v>(.*?)</v>', re.DOTALL)
+_TEXT_RX = re.compile(rb'<t\b[^>]*>(.*?)</t>', re.DOTALL)
+_SI_RX = re.compile(rb'<si\b[^>]*>(.*?)</si>', re.DOTALL)
+_SNIFF_BYTES = 16384
+
+# Partes del libro que hay que tocar para registrar una hoja nueva (fast_append_sheet)
+_WORKBOOK_PART = 'xl/workbook.xml'
+_WORKBOOK_RELS_PART = 'xl/_rels/workbook.xml.rels'
+_CONTENT_TYPES_PART = '[Content_Types].xml'
+_STYLES_PART = 'xl/styles.xml'
+_SHEET_ENTRY_RX = re.compile(rb'<sheet\b([^>]*?)/?>')
+_SHEET_NAME_RX = re.compile(rb'\bname="([^"]*)"')
+_SHEET_ID_RX = re.compile(rb'\bsheetId="(\d+)"')
+_REL_ID_RX = re.compile(rb'\bId="([^"]+)"')
+_FONTS_RX = re.compile(rb'(<fonts\b[^>]*>)(.*?)</fonts>', re.DOTALL)
+_CELL_XFS_RX = re.compile(rb'(<cellXfs\b[^>]*>)(.*?)</cellXfs>', re.DOTALL)
+_FONT_RX = re.compile(rb'<font\b[^>]*?(?:/>|>.*?</font>)', re.DOTALL)
+_XF_RX = re.compile(rb'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.DOTALL)
+_COUNT_RX = re.compile(rb'\bcount="\d+"')
+_INVALID_SHEET_TITLE_RX = re.compile(r'[\\*?:/\[\]]')
+_ILLEGAL_XML_CHARS_RX = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_BOLD_FONT_XML = b'<font><b val="1"/></font>'
+_WORKSHEET_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+_WORKSHEET_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+_RELS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+# Estilos de encabezado y totales (openpyxl los comparte en la tabla de estilos del libro)
+_BOLD = Font(bold=True)
+_CENTER = Alignment(horizontal='center')
+
+
+def _convert_cell(value):
+    """
+    Normaliza un valor de celda igual que pandas.read_excel (vacío -> '', 3.0 -> 3)
+    calamine devuelve date para las fechas sin hora, donde openpyxl devuelve datetime:
+    se pasan a datetime en la misma pasada
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if type(value) is date:
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def _xml_text(raw: bytes) -> str:
+    """Texto de una celda XML (une los tramos <t> de texto enriquecido)"""
+    parts = _TEXT_RX.findall(raw)
+    return html.unescape(b''.join(parts).decode('utf-8'))
+
+
+def _shared_strings(zf: zipfile.ZipFile, needed: int) -> List[str]:
+    """Lee de sharedStrings.xml solo hasta tener los primeros `needed` textos"""
+    buffer = b''
+    with zf.open('xl/sharedStrings.xml') as f:
+        while buffer.count(b'</si>') < needed:
+            chunk = f.read(65536)
+            if not chunk:
+                break
+            buffer += chunk
+    return [_xml_text(si) for si in _SI_RX.findall(buffer)]
+
+
+def _sniff_first_row(file_path: str, max_col: int = 5):
+    """
+    Lee la primera fila directamente del XML comprimido (solo los primeros KB de
+    sheet1.xml), sin que openpyxl materialice las celdas
+    Returns: lista de valores (texto o None), o None si no se pudo leer así
+    """
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            with zf.open('xl/worksheets/sheet1.xml') as f:
+                xml = f.read(_SNIFF_BYTES)
+            row_match = _ROW_RX.search(xml)
+            if row_match is None:
+                return None
+            row_num = _ROW_NUM_RX.search(row_match.group(1))
+            if row_num is not None and row_num.group(1) != b'1':
+                # La fila 1 está vacía
+                return [None] * max_col
+
+            values = [None] * max_col
+            shared_refs = []
+            for position, cell in enumerate(_CELL_RX.finditer(row_match.group(2) or b'')):
+                attrs, content = cell.group(1), cell.group(2) or b''
+                ref = _CELL_REF_RX.search(attrs)
+                col = position
+                if ref is not None:
+                    col = 0
+                    for letter in ref.group(1):
+                        col = col * 26 + letter - 64
+                    col -= 1
+                if col >= max_col:
+                    break
+                cell_type = _CELL_TYPE_RX.search(attrs)
+                cell_type = cell_type.group(1) if cell_type else b'n'
+                if cell_type == b'inlineStr':
+                    values[col] = _xml_text(content)
+                else:
+                    value = _VALUE_RX.search(content)
+                    if value is None:
+                        continue
+                    if cell_type == b's':
+                        shared_refs.append((col, int(value.group(1))))
+                    else:
+                        values[col] = html.unescape(value.group(1).decode('utf-8'))
+
+            if shared_refs:
+                strings = _shared_strings(zf, max(index for _, index in shared_refs) + 1)
+                for col, index in shared_refs:
+                    values[col] = strings[index]
+            return values
+    except (zipfile.BadZipFile, KeyError, IndexError, ValueError, OSError):
+        return None
+
+
+def _scale_and_total_numpy(block, tipo_cambio, is_nota_credito):
+    """
+    Multiplica cada fila por su tipo de cambio, pasa a negativo los montos positivos
+    de las Notas de Crédito (los que ya vienen negativos no se tocan) y suma cada columna
+    Modifica block en el lugar
+    Returns: totales por columna (ignorando celdas vacías, igual que Series.sum())
+    """
+    block *= tipo_cambio[:, None]
+    negate = is_nota_credito[:, None] & (block > 0)
+    block[negate] = -block[negate]
+    return np.nansum(block, axis=0)
+
+
+if njit is not None:
+    # Serial a propósito: clean_data corre en los hilos del threadpool de FastAPI
+    # y los kernels parallel=True no admiten llamadas concurrentes desde varios hilos
+    # (workqueue aborta el proceso; con TBB el intérprete queda colgado al salir)
+    @njit(cache=True)
+    def _scale_and_total(block, tipo_cambio, is_nota_credito):
+        """Misma operación que _scale_and_total_numpy en una sola pasada sobre el bloque"""
+        n_rows, n_cols = block.shape
+        totals = np.zeros(n_cols)
+        for i in range(n_rows):
+            for j in range(n_cols):
+                value = block[i, j] * tipo_cambio[i]
+                if is_nota_credito[i] and value > 0:
+                    value = -value
+                block[i, j] = value
+                if not np.isnan(value):
+                    totals[j] += value
+        return totals
+else:
+    _scale_and_total = _scale_and_total_numpy
+
+
+def _parse_dates(values: pd.Series, fmt: str) -> pd.Series:
+    """
+    Convierte una columna de fechas parseando cada valor distinto una sola vez
+    (en un libro mensual las fechas se repiten muchísimo: una por día)
+    Returns: Serie datetime64 con NaT en los valores inválidos
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object), format=fmt, errors='coerce')
+    # Los nulos quedan con código -1 -> NaT
+    result = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+class _UnsupportedValue(Exception):
+    """Valor que la escritura directa del XML no sabe representar (se usa openpyxl)"""
+
+
+def _cell_xml(ref: str, value, style: str) -> str:
+    """XML de una celda (texto en línea, número o booleano); vacía si no hay valor"""
+    if isinstance(value, str):
+        if value == '':
+            return f'<c r="{ref}"{style}/>' if style else ''
+        if _ILLEGAL_XML_CHARS_RX.search(value):
+            raise _UnsupportedValue(value)
+        space = ' xml:space="preserve"' if value != value.strip() else ''
+        return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{xml_escape(value)}</t></is></c>'
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c r="{ref}"{style} t="n"><v>{int(value)}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        if value != value:
+            return f'<c r="{ref}"{style}/>' if style else ''
+        if not np.isfinite(value):
+            raise _UnsupportedValue(value)
+        # Misma precisión con la que openpyxl escribe los números
+        return f'<c r="{ref}"{style} t="n"><v>{float(value):.16g}</v></c>'
+    if value is None or value is pd.NA or value is pd.NaT:
+        return f'<c r="{ref}"{style}/>' if style else ''
+    # Fechas y demás tipos necesitan formatos numéricos: quedan para openpyxl
+    raise _UnsupportedValue(value)
+
+
+def _sheet_xml(df: pd.DataFrame, header_style: str, bold_style: str) -> bytes:
+    """
+    XML completo de la hoja: encabezado en negrita centrado, datos y la última fila
+    (totales) en negrita, igual que el formato que aplica add_sheet_to_workbook
+    """
+    letters = [get_column_letter(col + 1) for col in range(len(df.columns))]
+    last_row = len(df) + 1
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<dimension ref="A1:{letters[-1]}{last_row}"/><sheetData>'
+    ]
+
+    row_style = f' s="{header_style}"'
+    cells = ''.join(_cell_xml(f'{letter}1', name, row_style) for letter, name in zip(letters, df.columns))
+    parts.append(f'<row r="1">{cells}</row>')
+
+    for row_num, values in enumerate(df.itertuples(index=False, name=None), start=2):
+        row_style = f' s="{bold_style}"' if row_num == last_row else ''
+        cells = ''.join(_cell_xml(f'{letter}{row_num}', value, row_style) for letter, value in zip(letters, values))
+        parts.append(f'<row r="{row_num}">{cells}</row>')
+
+    parts.append('</sheetData></worksheet>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _add_styles(styles: bytes):
+    """
+    Registra en styles.xml la fuente en negrita y los dos formatos de celda que usa
+    la hoja nueva (reutiliza los que ya estén)
+    Returns: (styles.xml modificado, índice encabezado, índice totales), o None si
+             el archivo no tiene la estructura esperada
+    """
+    fonts_match = _FONTS_RX.search(styles)
+    if fonts_match is None:
+        return None
+    fonts = _FONT_RX.findall(fonts_match.group(2))
+    if _BOLD_FONT_XML in fonts:
+        font_id = fonts.index(_BOLD_FONT_XML)
+    else:
+        font_id = len(fonts)
+        fonts_open = _COUNT_RX.sub(f'count="{font_id + 1}"'.encode(), fonts_match.group(1))
+        styles = (styles[:fonts_match.start()] + fonts_open + fonts_match.group(2)
+                  + _BOLD_FONT_XML + b'</fonts>' + styles[fonts_match.end():])
+
+    xfs_match = _CELL_XFS_RX.search(styles)
+    if xfs_match is None:
+        return None
+    xfs = _XF_RX.findall(xfs_match.group(2))
+    bold_xf = f'<xf numFmtId="0" fontId="{font_id}" fillId="0" borderId="0" xfId="0" applyFont="1"/>'.encode()
+    header_xf = (f'<xf numFmtId="0" fontId="{font_id}" fillId="0" borderId="0" xfId="0" applyFont="1" '
+                 f'applyAlignment="1"><alignment horizontal="center"/></xf>').encode()
+    new_xfs = []
+    indexes = []
+    for xf in (header_xf, bold_xf):
+        if xf in xfs:
+            indexes.append(xfs.index(xf))
+        else:
+            indexes.append(len(xfs) + len(new_xfs))
+            new_xfs.append(xf)
+    if new_xfs:
+        xfs_open = _COUNT_RX.sub(f'count="{len(xfs) + len(new_xfs)}"'.encode(), xfs_match.group(1))
+        styles = (styles[:xfs_match.start()] + xfs_open + xfs_match.group(2)
+                  + b''.join(new_xfs) + b'</cellXfs>' + styles[xfs_match.end():])
+    return styles, indexes[0], indexes[1]
+
+
+def _rewrite_zip(path: Union[str, BinaryIO], updated: Dict[str, bytes]):
+    """
+    Reescribe el .xlsx en un zip nuevo: copia tal cual (mismo nombre, fecha y
+    compresión) los miembros que no cambian y escribe las partes de updated en
+    lugar de las viejas, así el archivo no acumula copias sin referenciar
+    path: ruta del archivo (se reemplaza al terminar) o buffer en memoria
+    """
+    is_path = isinstance(path, (str, os.PathLike))
+    target = f"{path}.tmp" if is_path else io.BytesIO()
+    try:
+        with zipfile.ZipFile(path) as src, \
+                zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as dst:
+            for info in src.infolist():
+                if info.filename in updated:
+                    continue
+                copy = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                copy.compress_type = info.compress_type
+                copy.external_attr = info.external_attr
+                with src.open(info) as member, dst.open(copy, 'w') as out:
+                    shutil.copyfileobj(member, out, 1024 * 1024)
+            for name, data in updated.items():
+                dst.writestr(name, data)
+    except BaseException:
+        if is_path and os.path.exists(target):
+            os.unlink(target)
+        raise
+
+    if is_path:
+        os.replace(target, path)
+    else:
+        # En memoria: reemplazar el contenido del buffer
+        path.seek(0)
+        path.truncate()
+        path.write(target.getbuffer())
+        path.seek(0)
+
+
+def fast_append_sheet(path: Union[str, BinaryIO], sheet_name: str, df: pd.DataFrame) -> str:
+    """
+    Agrega una hoja a un .xlsx existente sin abrir el libro con openpyxl: escribe
+    el XML de la hoja nueva y actualiza solo las partes chicas que la registran
+    (workbook.xml, sus relaciones, [Content_Types].xml y styles.xml). Las hojas que
+    ya estaban se copian al zip nuevo sin parsear su XML
+    path: ruta del archivo o buffer en memoria (p. ej. io.BytesIO)
+    Returns: "success", "exists" si la pestaña ya existe, o "unsupported" si el libro
+             (o algún valor) requiere pasar por openpyxl
+    """
+    if (len(df.columns) == 0 or len(sheet_name) > 31 or _INVALID_SHEET_TITLE_RX.search(sheet_name)
+            or not zipfile.is_zipfile(path)):
+        return "unsupported"
+
+    with zipfile.ZipFile(path) as zf:
+        names = set(zf.namelist())
+        if not {_WORKBOOK_PART, _WORKBOOK_RELS_PART, _CONTENT_TYPES_PART, _STYLES_PART} <= names:
+            return "unsupported"
+        workbook = zf.read(_WORKBOOK_PART)
+        rels = zf.read(_WORKBOOK_RELS_PART)
+        content_types = zf.read(_CONTENT_TYPES_PART)
+        styles = zf.read(_STYLES_PART)
+
+    sheet_names = []
+    sheet_ids = []
+    for entry in _SHEET_ENTRY_RX.finditer(workbook):
+        name = _SHEET_NAME_RX.search(entry.group(1))
+        sheet_id = _SHEET_ID_RX.search(entry.group(1))
+        if name is None or sheet_id is None:
+            return "unsupported"
+        sheet_names.append(html.unescape(name.group(1).decode('utf-8')))
+        sheet_ids.append(int(sheet_id.group(1)))
+
+    if sheet_name in sheet_names:
+        return "exists"
+    # La hoja temporal de un archivo recién creado hay que borrarla: eso lo hace openpyxl
+    if "_temp" in sheet_names or b'</sheets>' not in workbook or b'</Relationships>' not in rels \
+            or b'</Types>' not in content_types:
+        return "unsupported"
+
+    patched = _add_styles(styles)
+    if patched is None:
+        return "unsupported"
+    styles, header_style, bold_style = patched
+
+    try:
+        sheet_xml = _sheet_xml(df, header_style, bold_style)
+    except _UnsupportedValue:
+        return "unsupported"
+
+    part_num = len(sheet_names) + 1
+    while f'xl/worksheets/sheet{part_num}.xml' in names:
+        part_num += 1
+    sheet_part = f'xl/worksheets/sheet{part_num}.xml'
+
+    rel_ids = {rel_id.decode() for rel_id in _REL_ID_RX.findall(rels)}
+    rel_num = len(rel_ids) + 1
+    while f'rId{rel_num}' in rel_ids:
+        rel_num += 1
+    rel_id = f'rId{rel_num}'
+
+    sheet_entry = (f'<sheet xmlns:r="{_RELS_NS}" name="{xml_escape(sheet_name, {chr(34): "&quot;"})}" '
+                   f'sheetId="{max(sheet_ids, default=0) + 1}" r:id="{rel_id}"/>')
+    rel_entry = f'<Relationship Id="{rel_id}" Type="{_WORKSHEET_REL_TYPE}" Target="/{sheet_part}"/>'
+    override = f'<Override PartName="/{sheet_part}" ContentType="{_WORKSHEET_CONTENT_TYPE}"/>'
+
+    updated = {
+        _WORKBOOK_PART: workbook.replace(b'</sheets>', sheet_entry.encode('utf-8') + b'</sheets>', 1),
+        _WORKBOOK_RELS_PART: rels.replace(b'</Relationships>', rel_entry.encode() + b'</Relationships>', 1),
+        _CONTENT_TYPES_PART: content_types.replace(b'</Types>', override.encode() + b'</Types>', 1),
+        _STYLES_PART: styles,
+    }
+
+    updated[sheet_part] = sheet_xml
+    _rewrite_zip(path, updated)
+    return "success"
 
 
 class ExcelProcessor:
@@ -15,18 +431,142 @@ class ExcelProcessor:
         "Nro. Doc. Receptor", "Denominación Receptor", 
         "Tipo Cambio", "Moneda"
     ]
+
+    # Tipos conocidos de antemano (evita la inferencia y conversiones posteriores)
+    COLUMN_DTYPES = {
+        "Tipo Cambio": "float64",
+    }
+    # Columnas de texto con pocos valores distintos: se guardan como categorías
+    # (se convierten después de leer porque pueden mezclar textos y números)
+    CATEGORY_COLUMNS = ("Tipo", "Moneda", "Denominación Receptor")
+    DATE_FORMAT = '%d/%m/%Y'
     
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.df = None
         self.month_detected = None
+        # True si self.df se leyó con mode="stream" (solo la columna Fecha)
+        self._partial = False
+        self._header_row0 = None
+        # Fechas de texto ya parseadas por read_excel (solo para detect_month) y su DataFrame
+        self._fechas = None
+        self._fechas_source = None
+        self._wb = None
+        # Resultado de clean_data y el DataFrame del que salió
+        self._clean_df = None
+        self._clean_source = None
+
+    def _sheet(self):
+        """
+        Primera hoja del Excel, abierto una sola vez en modo solo lectura
+        (se reutiliza entre detect_info_from_header y read_excel)
+        """
+        if self._wb is None:
+            self._wb = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+        return self._wb.worksheets[0]
+
+    def close(self):
+        """Cierra el Excel de entrada (libera el archivo)"""
+        if self._wb is not None:
+            self._wb.close()
+            self._wb = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Al salir del with el Excel de entrada queda cerrado (en Windows ya se puede borrar)
+        self.close()
+        return False
         
-    def read_excel(self) -> pd.DataFrame:
-        """Lee el Excel y retorna el DataFrame"""
-        # SIEMPRE saltar la primera fila (contiene el CUIT/título)
-        # Las columnas están en la segunda fila
-        self.df = pd.read_excel(self.file_path, skiprows=1)
-        
+    def _iter_rows(self):
+        """
+        Filas (valores) de la primera hoja
+        Usa calamine (parser en Rust) si está instalado; si no, openpyxl en modo streaming
+        """
+        if CalamineWorkbook is not None:
+            try:
+                sheet = CalamineWorkbook.from_path(self.file_path).get_sheet_by_index(0)
+                # Los valores se normalizan una sola vez, en read_excel (_convert_cell)
+                return iter(sheet.to_python(skip_empty_area=False))
+            except CalamineError as e:
+                # Solo los errores propios de calamine (zip/XML que no sabe leer, contraseña,
+                # hoja inexistente) pasan a openpyxl; cualquier otro error se propaga
+                print(f"   ⚠️  calamine no pudo leer el archivo ({type(e).__name__}: {e}), usando openpyxl")
+
+        ws = self._sheet()
+        ws.reset_dimensions()
+        return ws.iter_rows(min_row=1, values_only=True)
+
+    @staticmethod
+    def _only_fecha(rows):
+        """Deja solo la columna Fecha de cada fila (encabezado incluido)"""
+        header = next(rows, None)
+        if header is None:
+            return
+        try:
+            idx = list(header).index('Fecha')
+        except ValueError:
+            # Sin columna Fecha: se lee todo y detect_month informa el error como siempre
+            yield header
+            yield from rows
+            return
+        yield (header[idx],)
+        for row in rows:
+            yield (row[idx] if len(row) > idx else None,)
+
+    def read_excel(self, mode: str = "full") -> pd.DataFrame:
+        """
+        Lee el Excel y retorna el DataFrame
+        mode: "full" (todas las columnas) o "stream" (solo Fecha: alcanza para detect_month
+              sin armar el resto; clean_data vuelve a leer completo si hace falta)
+        """
+        rows = self._iter_rows()
+
+        # SIEMPRE saltar la primera fila (contiene el CUIT/título), pero guardarla
+        # para detect_info_from_header. Las columnas están en la segunda fila
+        self._header_row0 = next(rows, ())
+        self._partial = mode == "stream"
+        if self._partial:
+            rows = self._only_fecha(rows)
+
+        data = []
+        last_row_with_data = -1
+        for row in rows:
+            converted_row = [_convert_cell(value) for value in row]
+            while converted_row and converted_row[-1] == '':
+                converted_row.pop()
+            if converted_row:
+                last_row_with_data = len(data)
+            data.append(converted_row)
+        data = data[:last_row_with_data + 1]
+
+        if data:
+            width = max(len(row) for row in data)
+            data = [row + [''] * (width - len(row)) for row in data]
+
+        # Ya está todo en memoria: liberar el archivo
+        self.close()
+
+        # Mismo parser que usa pandas.read_excel (inferencia de tipos, encabezados, NaN)
+        if not data:
+            self.df = pd.DataFrame()
+            return self.df
+
+        df = TextParser(data, header=0, dtype=self.COLUMN_DTYPES).read()
+
+        # Fechas como texto "dd/mm/aaaa": se parsean una sola vez acá para detect_month,
+        # pero la columna queda como vino (el libro y la vista previa muestran el texto original)
+        self._fechas = None
+        self._fechas_source = df
+        if 'Fecha' in df.columns and df['Fecha'].dtype == 'object':
+            self._fechas = _parse_dates(df['Fecha'], self.DATE_FORMAT)
+
+        for col in self.CATEGORY_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+
+        self.df = df
         return self.df
     
     def detect_info_from_header(self) -> Dict:
@@ -34,24 +574,35 @@ class ExcelProcessor:
         Detecta información del encabezado (primera fila antes de skiprows)
         Returns: {cuit: str, tipo: str (ventas/compras)}
         """
-        import re
-        
-        # Leer SOLO la primera fila, sin procesar
-        df_header = pd.read_excel(self.file_path, nrows=1, header=None)
+        # Reusar la primera fila guardada por read_excel, o leer SOLO esa fila
+        # (las primeras 5 celdas, que son las únicas que se revisan): primero
+        # directo del XML y, si no se puede, con openpyxl
+        first_row = self._header_row0
+        if first_row is None:
+            first_row = _sniff_first_row(self.file_path)
+        if first_row is None:
+            first_row = next(
+                self._sheet().iter_rows(min_row=1, max_row=1, max_col=5, values_only=True), ()
+            )
+            # Con calamine, read_excel no vuelve a usar este workbook: liberarlo ya
+            if CalamineWorkbook is not None:
+                self.close()
+        self._header_row0 = first_row
+        first_row = ['' if value is None else str(value) for value in first_row]
         
         # La primera celda (columna 0, fila 0) contiene algo como:
         # "Mis Comprobantes Emitidos - CUIT 30716820080"
         # "Mis Comprobantes Recibidos - CUIT 30716820080"
         
-        header_text = str(df_header.iloc[0, 0])
+        header_text = first_row[0] if first_row else ''
         
         print(f"   🔍 Analizando encabezado: {header_text}")
         
         # Si no contiene la info esperada, intentar con otras celdas de la primera fila
         if 'comprobantes' not in header_text.lower() and 'cuit' not in header_text.lower():
             # Buscar en otras columnas de la primera fila
-            for col in range(min(5, len(df_header.columns))):
-                cell_value = str(df_header.iloc[0, col])
+            for col in range(min(5, len(first_row))):
+                cell_value = first_row[col]
                 if 'comprobantes' in cell_value.lower() or 'cuit' in cell_value.lower():
                     header_text = cell_value
                     print(f"   🔍 Encontrado en columna {col}: {header_text}")
@@ -65,12 +616,12 @@ class ExcelProcessor:
             tipo = 'compras'
         
         # Extraer CUIT usando regex (busca 11 dígitos consecutivos después de "CUIT")
-        cuit_match = re.search(r'CUIT\s*[:\-]?\s*(\d{11})', header_text, re.IGNORECASE)
+        cuit_match = _CUIT_RX.search(header_text)
         cuit = cuit_match.group(1) if cuit_match else None
         
         # Si no encontró con "CUIT", buscar cualquier secuencia de 11 dígitos
         if not cuit:
-            cuit_match = re.search(r'\b(\d{11})\b', header_text)
+            cuit_match = _DIGITS11_RX.search(header_text)
             cuit = cuit_match.group(1) if cuit_match else None
         
         print(f"   ✓ CUIT detectado: {cuit}")
@@ -88,37 +639,6 @@ class ExcelProcessor:
             'cuit': cuit,
             'tipo': tipo
         }
-        """
-        Detecta el mes y año predominante en el Excel
-        Returns: (mes, año)
-        """
-        if self.df is None:
-            self.read_excel()
-        
-        # Hacer una copia para no modificar el original
-        df_temp = self.df.copy()
-        
-        # Convertir la columna Fecha a datetime si no lo es ya
-        if df_temp['Fecha'].dtype == 'object':
-            # Intentar varios formatos comunes
-            df_temp['Fecha'] = pd.to_datetime(df_temp['Fecha'], format='%d/%m/%Y', errors='coerce')
-        
-        # Eliminar filas con fechas inválidas
-        df_temp = df_temp.dropna(subset=['Fecha'])
-        
-        if len(df_temp) == 0:
-            raise ValueError("No se encontraron fechas válidas en el archivo")
-        
-        # Encontrar el mes más frecuente
-        month_counts = df_temp['Fecha'].dt.month.value_counts()
-        most_common_month = month_counts.idxmax()
-        
-        # Obtener el año correspondiente
-        year_series = df_temp[df_temp['Fecha'].dt.month == most_common_month]['Fecha'].dt.year
-        year = int(year_series.mode()[0]) if len(year_series) > 0 else int(year_series.iloc[0])
-        
-        self.month_detected = (int(most_common_month), year)
-        return int(most_common_month), year
 
     def detect_month(self) -> Tuple[int, int]:
         """
@@ -128,30 +648,30 @@ class ExcelProcessor:
         if self.df is None:
             self.read_excel()
 
-        # Hacer una copia para no modificar el original
-        df_temp = self.df.copy()
+        # Trabajar solo sobre la columna Fecha (sin copiar todo el DataFrame)
+        fechas = self.df['Fecha']
 
         # Convertir la columna Fecha a datetime si no lo es ya
-        if df_temp['Fecha'].dtype == 'object':
-            # Intentar varios formatos comunes
-            df_temp['Fecha'] = pd.to_datetime(df_temp['Fecha'], format='%d/%m/%Y', errors='coerce')
+        # (read_excel deja parseadas las fechas de texto en self._fechas)
+        if fechas.dtype == 'object':
+            if self._fechas is not None and self._fechas_source is self.df:
+                fechas = self._fechas
+            else:
+                fechas = _parse_dates(fechas, self.DATE_FORMAT)
 
-        # Eliminar filas con fechas inválidas
-        df_temp = df_temp.dropna(subset=['Fecha'])
+        # Eliminar fechas inválidas
+        fechas = fechas.dropna()
 
-        if len(df_temp) == 0:
+        if len(fechas) == 0:
             raise ValueError("No se encontraron fechas válidas en el archivo")
 
-        # Encontrar el mes más frecuente
-        month_counts = df_temp['Fecha'].dt.month.value_counts()
-        most_common_month = month_counts.idxmax()
+        # Encontrar el período (año*100 + mes) más frecuente en una sola pasada
+        periodos = fechas.dt.year * 100 + fechas.dt.month
+        top = int(periodos.value_counts().idxmax())
+        most_common_month, year = top % 100, top // 100
 
-        # Obtener el año correspondiente
-        year_series = df_temp[df_temp['Fecha'].dt.month == most_common_month]['Fecha'].dt.year
-        year = int(year_series.mode()[0]) if len(year_series) > 0 else int(year_series.iloc[0])
-
-        self.month_detected = (int(most_common_month), year)
-        return int(most_common_month), year
+        self.month_detected = (most_common_month, year)
+        return most_common_month, year
     
     def get_month_name(self, month: int) -> str:
         """Convierte número de mes a nombre en español"""
@@ -169,34 +689,34 @@ class ExcelProcessor:
         2. Multiplica montos por tipo de cambio
         3. Convierte Notas de Crédito a negativo
         4. Agrega fila de totales
+        El resultado se reutiliza mientras self.df siga siendo el mismo DataFrame
         """
-        if self.df is None:
+        if self.df is None or self._partial:
             self.read_excel()
         
-        # Hacer una copia para trabajar
-        df_clean = self.df.copy()
+        if self._clean_df is not None and self._clean_source is self.df:
+            return self._clean_df
         
         # Encontrar el índice de la columna "Moneda"
         try:
-            moneda_idx = df_clean.columns.get_loc("Moneda")
+            moneda_idx = self.df.columns.get_loc("Moneda")
         except KeyError:
             raise ValueError("No se encontró la columna 'Moneda' en el Excel")
         
         # Obtener todas las columnas después de "Moneda"
-        columns_after_moneda = df_clean.columns[moneda_idx + 1:]
+        columns_after_moneda = self.df.iloc[:, moneda_idx + 1:]
         
-        # Identificar columnas a eliminar (las que están completamente vacías)
-        columns_to_drop = []
-        for col in columns_after_moneda:
-            if df_clean[col].isna().all() or (df_clean[col] == 0).all():
-                columns_to_drop.append(col)
+        # Identificar columnas a eliminar (completamente vacías o todas en cero)
+        # con dos reducciones sobre todo el bloque en lugar de dos por columna
+        empty_or_zero = columns_after_moneda.isna().all() | columns_after_moneda.eq(0).all()
+        columns_to_drop = columns_after_moneda.columns[empty_or_zero.to_numpy()]
         
-        # Eliminar columnas vacías
-        df_clean = df_clean.drop(columns=columns_to_drop)
+        # Eliminar columnas vacías: drop ya devuelve un DataFrame nuevo, así que no hace
+        # falta copiar el original (las columnas modificadas abajo se reemplazan enteras)
+        df_clean = self.df.drop(columns=columns_to_drop)
         
         # Identificar columnas numéricas (montos) después de "Moneda"
-        remaining_cols = [col for col in df_clean.columns[moneda_idx + 1:]]
-        numeric_cols = df_clean[remaining_cols].select_dtypes(include=['float64', 'int64']).columns.tolist()
+        numeric_cols = df_clean.iloc[:, moneda_idx + 1:].select_dtypes(include=np.number).columns
         
         # Identificar notas de crédito
         # Busca en la columna "Tipo" patrones como:
@@ -204,18 +724,33 @@ class ExcelProcessor:
         # - "Nota de Credito"
         # - "NC"
         # etc. (case insensitive)
-        is_nota_credito = df_clean['Tipo'].astype(str).str.contains('nota de cr[eé]dito|nc', case=False, na=False)
-        
-        # Multiplicar cada columna numérica por el tipo de cambio
+        # La columna tiene muy pocos valores distintos: se evalúa el regex una vez por
+        # valor y se expande a todas las filas a través de los códigos de la categoría
+        tipos = df_clean['Tipo']
+        if not isinstance(tipos.dtype, pd.CategoricalDtype):
+            tipos = tipos.astype('category')
+        # El último elemento (False) es el que toman las celdas vacías (código -1)
+        nc_by_code = np.array(
+            [_NOTA_CREDITO_RX.search(str(tipo)) is not None for tipo in tipos.cat.categories] + [False],
+            dtype=bool
+        )
+        is_nota_credito = nc_by_code[tipos.cat.codes.to_numpy()]
+        
+        # Multiplicar todas las columnas numéricas por el tipo de cambio
         # Y convertir a negativo si es nota de crédito
-        for col in numeric_cols:
-            # Primero multiplicar por tipo de cambio
-            df_clean[col] = df_clean[col] * df_clean['Tipo Cambio']
-            
-            # Luego convertir a negativo si es nota de crédito y el valor es positivo
+        # (una sola operación sobre el bloque completo en lugar de una por columna;
+        # el mismo bloque se reusa después para los totales)
+        totals = np.zeros(len(numeric_cols), dtype=np.float64)
+        if len(numeric_cols):
+            # Multiplicar por tipo de cambio (cada fila por su cotización) y luego
+            # convertir a negativo si es nota de crédito y el valor es positivo
             # IMPORTANTE: Si el valor ya viene negativo del sistema, no lo tocamos
             # Solo convertimos los positivos a negativos
-            df_clean.loc[is_nota_credito & (df_clean[col] > 0), col] = -df_clean.loc[is_nota_credito & (df_clean[col] > 0), col]
+            # (con numba instalado es un único kernel compilado que también suma los totales)
+            tipo_cambio = df_clean['Tipo Cambio'].to_numpy(dtype=np.float64)
+            block = df_clean[numeric_cols].to_numpy(dtype=np.float64, copy=True)
+            totals = _scale_and_total(block, tipo_cambio, is_nota_credito)
+            df_clean[numeric_cols] = block
         
         # Formatear la columna Fecha si es necesario
         # Verificar si ya es string o si es datetime
@@ -226,17 +761,15 @@ class ExcelProcessor:
             # Es datetime, convertir a string
             df_clean['Fecha'] = df_clean['Fecha'].dt.strftime('%d/%m/%Y')
         
-        # Calcular totales para las columnas numéricas
-        totals_row = {}
-        for col in df_clean.columns:
-            if col in numeric_cols:
-                totals_row[col] = df_clean[col].sum()
-            else:
-                totals_row[col] = ''
+        # Fila de totales para las columnas numéricas (ya sumadas sobre el bloque)
+        totals_row = pd.Series('', index=df_clean.columns, dtype=object)
+        totals_row[numeric_cols] = totals
         
         # Agregar fila de totales
-        df_clean = pd.concat([df_clean, pd.DataFrame([totals_row])], ignore_index=True)
+        df_clean.loc[len(df_clean)] = totals_row
         
+        self._clean_df = df_clean
+        self._clean_source = self.df
         return df_clean
     
     def save_to_excel(self, output_path: str, df: pd.DataFrame = None):
@@ -244,17 +777,27 @@ class ExcelProcessor:
         if df is None:
             df = self.clean_data()
         
-        df.to_excel(output_path, index=False, engine='openpyxl')
+        # xlsxwriter con constant_memory escribe fila por fila sin armar el libro en memoria
+        engine_kwargs = {'options': {'constant_memory': True}} if _XLSX_ENGINE == 'xlsxwriter' else {}
+        with pd.ExcelWriter(output_path, engine=_XLSX_ENGINE, engine_kwargs=engine_kwargs) as writer:
+            df.to_excel(writer, index=False)
         return output_path
     
-    def add_sheet_to_workbook(self, workbook_path: str, sheet_name: str, df: pd.DataFrame = None) -> str:
+    def add_sheet_to_workbook(self, workbook_path: Union[str, BinaryIO], sheet_name: str,
+                              df: pd.DataFrame = None) -> str:
         """
         Agrega una nueva pestaña a un Excel existente
+        workbook_path: ruta del archivo o buffer en memoria (p. ej. io.BytesIO)
         Returns: "success" o "exists" si la pestaña ya existe
         """
         if df is None:
             df = self.clean_data()
         
+        # Camino rápido: agregar la hoja sin leer ni reescribir las que ya existen
+        result = fast_append_sheet(workbook_path, sheet_name, df)
+        if result != "unsupported":
+            return result
+        
         # Abrir el workbook existente
         try:
             wb = openpyxl.load_workbook(workbook_path)
@@ -265,35 +808,42 @@ class ExcelProcessor:
             for sheet in wb.worksheets:
                 wb.remove(sheet)
         
-        # Verificar si la pestaña ya existe
-        if sheet_name in wb.sheetnames:
-            return "exists"
-        
-        # Eliminar la hoja temporal si existe (creada al crear archivo nuevo)
-        if "_temp" in wb.sheetnames:
-            temp_sheet = wb["_temp"]
-            wb.remove(temp_sheet)
-        
-        # Crear nueva pestaña
-        ws = wb.create_sheet(title=sheet_name)
-        
-        # Escribir los datos
-        for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
-            for c_idx, value in enumerate(row, 1):
-                cell = ws.cell(row=r_idx, column=c_idx, value=value)
-                
-                # Formato para la primera fila (encabezados)
-                if r_idx == 1:
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal='center')
-                
-                # Formato para la última fila (totales)
-                if r_idx == len(df) + 1:
-                    cell.font = Font(bold=True)
-        
-        # Guardar el workbook
-        wb.save(workbook_path)
-        return "success"
+        try:
+            # Verificar si la pestaña ya existe
+            if sheet_name in wb.sheetnames:
+                return "exists"
+            
+            # Eliminar la hoja temporal si existe (creada al crear archivo nuevo)
+            if "_temp" in wb.sheetnames:
+                temp_sheet = wb["_temp"]
+                wb.remove(temp_sheet)
+            
+            # Crear nueva pestaña
+            ws = wb.create_sheet(title=sheet_name)
+            
+            # Escribir los datos fila por fila
+            for row in dataframe_to_rows(df, index=False, header=True):
+                ws.append(row)
+
+            # Formato para la primera fila (encabezados)
+            for cell in ws[1]:
+                cell.font = _BOLD
+                cell.alignment = _CENTER
+
+            # Formato para la última fila (totales)
+            for cell in ws[len(df) + 1]:
+                cell.font = _BOLD
+            
+            # Guardar el workbook
+            if not isinstance(workbook_path, (str, os.PathLike)):
+                # En memoria: reemplazar el contenido del buffer
+                workbook_path.seek(0)
+                workbook_path.truncate()
+            wb.save(workbook_path)
+            return "success"
+        finally:
+            # Cerrar siempre el libro, también si falla a mitad de camino
+            wb.close()
 
 
 def process_excel_file(file_path: str, output_path: str = None) -> Dict:
@@ -301,13 +851,13 @@ def process_excel_file(file_path: str, output_path: str = None) -> Dict:
     Función helper para procesar un Excel completo
     Returns: dict con info del procesamiento
     """
-    processor = ExcelProcessor(file_path)
-    processor.read_excel()
-    
-    month, year = processor.detect_month()
-    month_name = processor.get_month_name(month)
-    
-    df_clean = processor.clean_data()
+    with ExcelProcessor(file_path) as processor:
+        processor.read_excel()
+        
+        month, year = processor.detect_month()
+        month_name = processor.get_month_name(month)
+        
+        df_clean = processor.clean_data()
     
     result = {
         "month": month,
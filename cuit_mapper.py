@@ -2,49 +2,165 @@
 Maneja el mapeo entre CUIT y nombres de clientes
 """
 
+import bisect
 import json
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 CUIT_MAP_FILE = 'cuit_mapping.json'
 
 class CUITMapper:
     """Maneja el mapeo CUIT -> Cliente"""
     
     def __init__(self):
+        # Se incrementa con cada cambio del mapeo (sirve de clave para caches derivados)
+        self.version = 0
+        self._mtime_ns = self._file_mtime()
         self.mapping = self.load_mapping()
+        self._dirty = False
+    
+    @property
+    def mapping(self) -> dict:
+        """Mapeo CUIT -> Cliente"""
+        return self._mapping
+    
+    @mapping.setter
+    def mapping(self, value: dict):
+        self._mapping = value
+        self._rebuild_reverse()
+        # (nombre en minúsculas, CUIT) ordenado: se mantiene con bisect en cada alta/baja
+        self._sorted = sorted((name.lower(), cuit) for cuit, name in value.items())
+        self.version += 1
+    
+    @staticmethod
+    def _file_mtime():
+        try:
+            return os.stat(CUIT_MAP_FILE).st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def refresh(self):
+        """
+        Recarga el mapeo si cuit_mapping.json cambió en disco (p. ej. editado a mano)
+        Solo cuesta un stat; no pisa cambios propios todavía no guardados
+        """
+        if self._dirty:
+            return
+        mtime = self._file_mtime()
+        if mtime != self._mtime_ns:
+            self._mtime_ns = mtime
+            self.mapping = self.load_mapping()
+    
+    def _rebuild_reverse(self):
+        """
+        Índice inverso Cliente -> CUIT
+        Si un nombre se repite gana el primer CUIT (igual que la búsqueda lineal)
+        """
+        self._reverse = {}
+        for cuit, name in self._mapping.items():
+            self._reverse.setdefault(name, cuit)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
     
     def load_mapping(self) -> dict:
         """Carga el mapeo desde el archivo JSON"""
         if os.path.exists(CUIT_MAP_FILE):
+            if orjson is not None:
+                with open(CUIT_MAP_FILE, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(CUIT_MAP_FILE, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return {}
     
     def save_mapping(self):
-        """Guarda el mapeo en el archivo JSON"""
-        with open(CUIT_MAP_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.mapping, f, indent=2, ensure_ascii=False)
+        """
+        Guarda el mapeo en el archivo JSON
+        Se escribe a un archivo temporal y se reemplaza el original de una sola vez,
+        así un corte a mitad de escritura nunca deja el JSON truncado
+        """
+        tmp_path = CUIT_MAP_FILE + '.tmp'
+        if orjson is not None:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(self.mapping, option=orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.mapping, f, separators=(',', ':'), ensure_ascii=False)
+        os.replace(tmp_path, CUIT_MAP_FILE)
+        self._mtime_ns = self._file_mtime()
+        self._dirty = False
+    
+    def flush(self):
+        """Guarda el mapeo solo si hubo cambios desde la última escritura"""
+        if self._dirty:
+            self.save_mapping()
+    
+    def _unsort(self, cuit: str, client_name: str):
+        """Saca (cliente, CUIT) de la lista ordenada"""
+        index = bisect.bisect_left(self._sorted, (client_name.lower(), cuit))
+        if index < len(self._sorted) and self._sorted[index] == (client_name.lower(), cuit):
+            del self._sorted[index]
     
     def add_client(self, cuit: str, client_name: str):
-        """Agrega un cliente al mapeo"""
-        self.mapping[cuit] = client_name
-        self.save_mapping()
+        """Agrega un cliente al mapeo (se guarda en disco con flush())"""
+        previous_name = self._mapping.get(cuit)
+        self._mapping[cuit] = client_name
+        if previous_name is not None and previous_name != client_name:
+            # Se renombró un CUIT existente: el índice viejo quedó desactualizado
+            self._rebuild_reverse()
+        else:
+            self._reverse.setdefault(client_name, cuit)
+        if previous_name != client_name:
+            if previous_name is not None:
+                self._unsort(cuit, previous_name)
+            bisect.insort(self._sorted, (client_name.lower(), cuit))
+        self._dirty = True
+        self.version += 1
+    
+    def remove_client(self, cuit: str):
+        """Quita un cliente del mapeo (se guarda en disco con flush())"""
+        client_name = self._mapping.pop(cuit, None)
+        if client_name is None:
+            return
+        if self._reverse.get(client_name) == cuit:
+            # Puede haber otro CUIT con el mismo nombre que pase a ser el del índice
+            self._rebuild_reverse()
+        self._unsort(cuit, client_name)
+        self._dirty = True
+        self.version += 1
     
     def get_client_by_cuit(self, cuit: str) -> str:
         """Obtiene el nombre del cliente por CUIT"""
+        self.refresh()
         return self.mapping.get(cuit, None)
     
     def get_cuit_by_client(self, client_name: str) -> str:
         """Obtiene el CUIT por nombre de cliente"""
-        for cuit, name in self.mapping.items():
-            if name == client_name:
-                return cuit
-        return None
+        self.refresh()
+        return self._reverse.get(client_name)
     
     def client_exists(self, cuit: str) -> bool:
         """Verifica si un CUIT ya existe"""
+        self.refresh()
         return cuit in self.mapping
     
     def get_all_clients(self) -> dict:
         """Retorna todos los clientes"""
+        self.refresh()
         return self.mapping.copy()
+    
+    def get_sorted_clients(self) -> list:
+        """
+        Retorna todos los clientes ordenados alfabéticamente por nombre (sin volver a ordenar)
+        Returns: lista de (cuit, nombre)
+        """
+        self.refresh()
+        return [(cuit, self._mapping[cuit]) for _, cuit in self._sorted]
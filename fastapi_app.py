@@ -1,12 +1,34 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import functools
+import logging
 import tempfile
+import time
+import io
 import os
 import shutil
+import pandas as pd
+
+try:
+    import orjson  # noqa: F401
+    DEFAULT_RESPONSE_CLASS = ORJSONResponse
+except ImportError:
+    DEFAULT_RESPONSE_CLASS = JSONResponse
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
 
 # Importar nuestros módulos
 import sys
@@ -17,7 +39,11 @@ from drive_handler import DriveHandler
 # CUITMapper está en la raíz
 from cuit_mapper import CUITMapper
 
-app = FastAPI(title="Procesador de Libros IVA")
+# Los módulos de Utils registran su detalle con logging (por defecto solo advertencias).
+# Usar LOG_LEVEL=INFO o LOG_LEVEL=DEBUG para ver cada paso de Drive.
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(), format='%(message)s')
+
+app = FastAPI(title="Procesador de Libros IVA", default_response_class=DEFAULT_RESPONSE_CLASS)
 
 # Configurar CORS
 app.add_middleware(
@@ -34,8 +60,118 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Instancia global del handler de Drive y mapper
 drive_handler = DriveHandler()
 cuit_mapper = CUITMapper()
+# Respuesta de /api/clients ya serializada, se rearma solo cuando cambia el mapeo
+_clients_cache = {'version': None, 'body': b''}
+# Respuesta de /api/health, reutilizada durante HEALTH_CACHE_TTL segundos (probes frecuentes)
+HEALTH_CACHE_TTL = 5
+_health_cache = {'expires': 0.0, 'response': None}
+
+# Las llamadas a Drive son HTTP bloqueante: corren en su propio pool acotado para no frenar
+# el event loop ni ocupar el threadpool de FastAPI (8 en vuelo, dentro de la cuota de Drive)
+DRIVE_MAX_CONCURRENCY = 8
+drive_executor = ThreadPoolExecutor(max_workers=DRIVE_MAX_CONCURRENCY, thread_name_prefix="drive")
+_drive_sem = asyncio.Semaphore(DRIVE_MAX_CONCURRENCY)
+
+
+async def _drive_call(func, *args, **kwargs):
+    """Ejecuta una función bloqueante de Drive en drive_executor y espera su resultado"""
+    async with _drive_sem:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(drive_executor, functools.partial(func, *args, **kwargs))
+
+
+# Tamaño de bloque para copiar los archivos subidos a disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Carpeta de los temporales: en Linux /dev/shm (tmpfs) para que los Excel no pasen por disco
+TMP_DIR = os.environ.get("IVA_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+# Hasta este tamaño el libro del año se descarga y modifica en memoria; si es más grande, en TMP_DIR
+IN_MEMORY_MAX_BYTES = 50 * 1024 * 1024
+
+
+@contextlib.contextmanager
+def _work_dir():
+    """
+    Carpeta temporal para los archivos de un request; al salir se borra entera
+    (si en Windows queda algún archivo abierto no se corta el request por eso)
+    """
+    path = tempfile.mkdtemp(prefix='iva_', dir=TMP_DIR)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _copy_upload(source, path: str):
+    """Copia el archivo subido (ya en disco/memoria) a path en bloques de 1MB"""
+    source.seek(0)
+    with open(path, 'wb') as tmp:
+        shutil.copyfileobj(source, tmp, UPLOAD_CHUNK_SIZE)
+
+
+async def _spool_upload(file: UploadFile, work_dir: str) -> str:
+    """
+    Copia el archivo subido a work_dir en bloques de 1MB (sin cargarlo entero en memoria)
+    Returns: ruta del archivo copiado
+    """
+    path = os.path.join(work_dir, 'entrada.xlsx')
+    # Abrir, copiar y cerrar corren en un hilo de anyio: el event loop no
+    # queda bloqueado por el disco mientras se atienden otras requests
+    await run_in_threadpool(_copy_upload, file.file, path)
+    return path
+
+
+def _preview_records(df: pd.DataFrame) -> list:
+    """
+    Filas de la vista previa como lista de dicts, con celdas vacías como ''
+    (se arma columna por columna en vez de fillna + to_dict por fila)
+    """
+    columns = []
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=object)
+        values[pd.isna(values)] = ''
+        columns.append(values.tolist())
+    names = df.columns.tolist()
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _preview_arrow(df: pd.DataFrame, total_rows: int) -> bytes:
+    """
+    Vista previa como stream Arrow IPC (columnar, con nulos nativos en vez de '')
+    Las columnas que mezclan textos y números se envían como texto
+    Returns: bytes del stream (total_rows va en la metadata del schema)
+    """
+    arrays = []
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == object:
+            # Las celdas vacías de la fila de totales son '': en Arrow van como nulos
+            values = values.mask(values.eq(''))
+        try:
+            arrays.append(pa.array(values, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([None if pd.isna(value) else str(value) for value in values]))
+    table = pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+    table = table.replace_schema_metadata({'total_rows': str(total_rows)})
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
 
 # Modelos Pydantic
+class ClientOut(BaseModel):
+    name: str
+    id: str  # CUIT
+    enabled: bool
+
+
+class ClientsResponse(BaseModel):
+    success: bool
+    clients: List[ClientOut]
+
+
 class ProcessRequest(BaseModel):
     client: str
     tipo: str  # "ventas" o "compras"
@@ -49,7 +185,7 @@ async def startup_event():
     """Inicializar la conexión con Drive al arrancar"""
     try:
         print("\n🔄 Verificando autenticación con Google Drive...")
-        drive_handler.authenticate()
+        await _drive_call(drive_handler.authenticate)
         print("✅ Conexión con Google Drive establecida\n")
     except Exception as e:
         print(f"⚠️  Advertencia: Error al conectar con Drive: {str(e)}")
@@ -62,27 +198,60 @@ async def root():
     return FileResponse("static/index.html")
 
 
-@app.get("/api/clients")
+@app.get("/api/clients", response_class=Response, responses={200: {"model": ClientsResponse}})
 async def get_clients():
-    """Obtener lista de clientes desde el mapeo CUIT"""
+    """
+    Obtener lista de clientes desde el mapeo CUIT
+    ClientsResponse solo documenta el formato en OpenAPI: el cuerpo se serializa una vez
+    por versión del mapeo y FastAPI no lo valida (lo cubre tests/test_clients_endpoint.py)
+    """
     try:
-        # Obtener todos los clientes del mapeo
-        all_clients = cuit_mapper.get_all_clients()
+        cuit_mapper.refresh()
+        if _clients_cache['version'] != cuit_mapper.version:
+            # Convertir a formato esperado por el frontend (el mapper ya los da en orden alfabético)
+            clients = [
+                {
+                    'name': name,
+                    'id': cuit,
+                    'enabled': True  # Todos habilitados
+                }
+                for cuit, name in cuit_mapper.get_sorted_clients()
+            ]
+            _clients_cache['body'] = DEFAULT_RESPONSE_CLASS(content={"success": True, "clients": clients}).body
+            _clients_cache['version'] = cuit_mapper.version
+        
+        # Devolver un Response evita que FastAPI valide y serialice la lista en cada request
+        return Response(content=_clients_cache['body'], media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/clients-with-status")
+async def get_clients_with_status(tipo: str, year: int):
+    """
+    Lista de clientes indicando si ya tienen el libro del año en Drive
+    (todas las verificaciones salen en unas pocas consultas agrupadas, no una por cliente)
+    """
+    try:
+        all_clients = cuit_mapper.get_sorted_clients()
+        jobs = [(name, tipo, year) for _, name in all_clients]
+        status = await _drive_call(drive_handler.check_year_files_bulk, jobs, strict=False) if jobs else {}
         
-        # Convertir a formato esperado por el frontend
         clients = [
             {
                 'name': name,
                 'id': cuit,
-                'enabled': True  # Todos habilitados
+                'enabled': True,
+                'file_exists': status[(name, tipo, year)]['exists'],
+                'file_id': status[(name, tipo, year)]['file_id'],
+                'filename': status[(name, tipo, year)]['filename'],
+                # Motivo si el cliente del mapeo no tiene carpeta (o Ventas/Compras) en Drive
+                'error': status[(name, tipo, year)].get('error')
             }
-            for cuit, name in all_clients.items()
+            for cuit, name in all_clients
         ]
         
-        # Ordenar alfabéticamente
-        clients.sort(key=lambda x: x['name'].lower())
-        
-        return {"success": True, "clients": clients}
+        return {"success": True, "tipo": tipo, "year": year, "clients": clients}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -91,19 +260,15 @@ async def get_clients():
 async def detect_month(file: UploadFile = File(...)):
     """Detecta el mes y año del archivo Excel"""
     try:
-        # Guardar archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-        
-        # Procesar
-        processor = ExcelProcessor(tmp_path)
-        processor.read_excel()
-        month, year = processor.detect_month()
-        month_name = processor.get_month_name(month)
-        
-        # Limpiar
-        os.unlink(tmp_path)
+        with _work_dir() as work_dir:
+            # Guardar archivo temporal
+            tmp_path = await _spool_upload(file, work_dir)
+            
+            # Procesar
+            with ExcelProcessor(tmp_path) as processor:
+                processor.read_excel(mode="stream")
+                month, year = processor.detect_month()
+                month_name = processor.get_month_name(month)
         
         return {
             "success": True,
@@ -112,8 +277,6 @@ async def detect_month(file: UploadFile = File(...)):
             "month_name": month_name
         }
     except Exception as e:
-        if 'tmp_path' in locals():
-            os.unlink(tmp_path)
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -129,100 +292,116 @@ async def process_file(
 ):
     """Procesa el archivo y lo sube a Drive"""
     
-    tmp_input = None
-    tmp_output = None
-    downloaded_file = None
-    
     try:
-        print(f"\n{'='*60}")
-        print(f"INICIANDO PROCESAMIENTO")
-        print(f"Cliente: {client}, Tipo: {tipo}, Año: {year}, Mes: {month_name}")
-        print(f"{'='*60}\n")
-        
-        # 1. Guardar archivo subido
-        print("📁 Guardando archivo temporal...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(await file.read())
-            tmp_input = tmp.name
-        print(f"   ✓ Archivo guardado: {tmp_input}")
-        
-        # 2. Procesar Excel
-        print("\n🔄 Procesando Excel...")
-        processor = ExcelProcessor(tmp_input)
-        processor.read_excel()
-        df_clean = processor.clean_data()
-        print(f"   ✓ Procesado: {len(df_clean)-1} filas, {len(df_clean.columns)} columnas")
-        
-        # 3. Verificar si existe el archivo del año en Drive
-        print(f"\n🔍 Verificando archivo en Drive...")
-        file_check = drive_handler.check_year_file_exists(client, tipo, year)
-        
-        if not file_check['exists']:
-            print(f"   ⚠ Archivo '{file_check['filename']}' NO existe")
-            if not create_if_not_exists:
-                return {
-                    "success": False,
-                    "needs_confirmation": True,
-                    "message": f"El archivo '{file_check['filename']}' no existe. ¿Desea crearlo?"
-                }
-            else:
-                # Crear el archivo del año
+        with _work_dir() as work_dir:
+            print(f"\n{'='*60}")
+            print(f"INICIANDO PROCESAMIENTO")
+            print(f"Cliente: {client}, Tipo: {tipo}, Año: {year}, Mes: {month_name}")
+            print(f"{'='*60}\n")
+        
+            # 1. Guardar archivo subido
+            print("📁 Guardando archivo temporal...")
+            tmp_input = await _spool_upload(file, work_dir)
+            print(f"   ✓ Archivo guardado: {tmp_input}")
+        
+            # 2-4. Procesar el Excel (CPU) mientras se busca y descarga el libro del año (red)
+            def _process_local():
+                print("\n🔄 Procesando Excel...")
+                with ExcelProcessor(tmp_input) as processor:
+                    processor.read_excel()
+                    df_clean = processor.clean_data()
+                print(f"   ✓ Procesado: {len(df_clean)-1} filas, {len(df_clean.columns)} columnas")
+                return processor, df_clean
+        
+            def _download_year_file(file_check):
+                # 4. Descargar el archivo del año desde Drive (o reusar la copia local si no cambió)
+                print(f"\n⬇️  Descargando '{file_check['filename']}' desde Drive...")
+                # La búsqueda ya trae la versión del archivo; solo uno recién creado hay que consultarlo
+                metadata = file_check.get('metadata') or drive_handler.get_metadata(file_check['file_id'])
+                # Los libros de tamaño normal no pasan por disco (los Google Sheets no informan size)
+                if int(metadata.get('size') or 0) > IN_MEMORY_MAX_BYTES:
+                    workbook = os.path.join(work_dir, 'libro_anual.xlsx')
+                else:
+                    workbook = io.BytesIO()
+                
+                if drive_handler.fetch_cached_workbook(file_check['file_id'], workbook, metadata):
+                    print(f"   ✓ Sin cambios en Drive, se usa la copia local")
+                else:
+                    if isinstance(workbook, str):
+                        drive_handler.download_file(file_check['file_id'], workbook, file_check['mime_type'])
+                    else:
+                        workbook = drive_handler.download_to_bytesio(file_check['file_id'], file_check['mime_type'])
+                    drive_handler.store_cached_workbook(file_check['file_id'], workbook, metadata)
+                    print(f"   ✓ Descargado ({'a ' + workbook if isinstance(workbook, str) else 'en memoria'})")
+                return workbook
+        
+            def _fetch_remote():
+                # 3. Verificar si existe el archivo del año en Drive
+                print(f"\n🔍 Verificando archivo en Drive...")
+                file_check = drive_handler.check_year_file_exists(client, tipo, year)
+            
+                if not file_check['exists']:
+                    # Se crea recién cuando el Excel subido se procesó bien (ver abajo)
+                    print(f"   ⚠ Archivo '{file_check['filename']}' NO existe")
+                    return file_check, None
+                print(f"   ✓ Archivo encontrado: {file_check['file_id']}")
+                return file_check, _download_year_file(file_check)
+        
+            def _create_remote(file_check):
+                # Crear el archivo del año y descargarlo como si ya existiera
                 print(f"   🆕 Creando archivo '{file_check['filename']}'...")
                 file_id = drive_handler.create_year_file(client, tipo, year)
                 file_check['file_id'] = file_id
+                file_check['mime_type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                file_check['metadata'] = None
                 file_check['exists'] = True
                 print(f"   ✓ Archivo creado: {file_id}")
-        else:
-            print(f"   ✓ Archivo encontrado: {file_check['file_id']}")
-        
-        # 4. Descargar el archivo del año desde Drive
-        print(f"\n⬇️  Descargando '{file_check['filename']}' desde Drive...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            downloaded_file = tmp.name
+                return _download_year_file(file_check)
         
-        drive_handler.download_file(file_check['file_id'], downloaded_file)
-        print(f"   ✓ Descargado a: {downloaded_file}")
-        
-        # 5. Agregar pestaña al libro del año
-        print(f"\n📝 Agregando pestaña '{month_name}'...")
-        result = processor.add_sheet_to_workbook(downloaded_file, month_name, df_clean)
-        
-        if result == "exists":
-            raise HTTPException(
-                status_code=400,
-                detail=f"La pestaña '{month_name}' ya existe en el archivo '{file_check['filename']}'"
+            # Esperar a las dos partes antes de seguir (o de limpiar, si alguna falló)
+            local_result, remote_result = await asyncio.gather(
+                run_in_threadpool(_process_local),
+                _drive_call(_fetch_remote),
+                return_exceptions=True
             )
-        print(f"   ✓ Pestaña agregada")
-        
-        # 6. Subir el archivo actualizado a Drive
-        print(f"\n⬆️  Subiendo archivo actualizado a Drive...")
-        drive_handler.update_file(file_check['file_id'], downloaded_file)
-        print(f"   ✓ Archivo actualizado en Drive")
-        
-        # 7. Limpiar archivos temporales
-        print(f"\n🧹 Limpiando archivos temporales...")
-        
-        # Cerrar cualquier referencia al archivo antes de eliminar
-        import gc
-        gc.collect()
-        
-        # Intentar eliminar con retry para Windows
-        import time
-        for attempt in range(3):
-            try:
-                if tmp_input and os.path.exists(tmp_input):
-                    os.unlink(tmp_input)
-                if downloaded_file and os.path.exists(downloaded_file):
-                    os.unlink(downloaded_file)
-                break
-            except PermissionError:
-                if attempt < 2:
-                    time.sleep(0.5)  # Esperar un poco
-                else:
-                    print(f"   ⚠️  No se pudieron eliminar archivos temporales (se eliminarán después)")
-        
-        print(f"   ✓ Limpieza completada")
+            for outcome in (local_result, remote_result):
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            processor, df_clean = local_result
+            file_check, workbook = remote_result
+        
+            if not file_check['exists']:
+                if not create_if_not_exists:
+                    return {
+                        "success": False,
+                        "needs_confirmation": True,
+                        "message": f"El archivo '{file_check['filename']}' no existe. ¿Desea crearlo?"
+                    }
+                # Solo con el Excel ya procesado: un archivo inválido no deja un libro vacío en Drive
+                workbook = await _drive_call(_create_remote, file_check)
+        
+            # 5. Agregar pestaña al libro del año
+            print(f"\n📝 Agregando pestaña '{month_name}'...")
+            # Reescribir el libro (zip o load/save de openpyxl) es CPU y disco: fuera del event loop
+            result = await run_in_threadpool(processor.add_sheet_to_workbook, workbook, month_name, df_clean)
+        
+            if result == "exists":
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"La pestaña '{month_name}' ya existe en el archivo '{file_check['filename']}'"
+                )
+            print(f"   ✓ Pestaña agregada")
+        
+            # 6. Subir el archivo actualizado a Drive
+            print(f"\n⬆️  Subiendo archivo actualizado a Drive...")
+            await _drive_call(
+                drive_handler.update_file,
+                file_check['file_id'], workbook,
+                fields='id, md5Checksum, modifiedTime', mime_type=file_check['mime_type']
+            )
+            print(f"   ✓ Archivo actualizado en Drive")
         
+        # 7. Los temporales se borran al salir de _work_dir
         print(f"\n{'='*60}")
         print(f"✅ PROCESAMIENTO COMPLETADO EXITOSAMENTE")
         print(f"{'='*60}\n")
@@ -244,39 +423,29 @@ async def process_file(
         import traceback
         traceback.print_exc()
         
-        # Limpiar en caso de error
-        import time
-        import gc
-        gc.collect()
-        
-        for attempt in range(2):
-            try:
-                if tmp_input and os.path.exists(tmp_input):
-                    os.unlink(tmp_input)
-                if downloaded_file and os.path.exists(downloaded_file):
-                    os.unlink(downloaded_file)
-                break
-            except PermissionError:
-                if attempt < 1:
-                    time.sleep(0.5)
-        
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/preview")
-async def preview_file(file: UploadFile = File(...)):
-    """Genera una vista previa del archivo procesado"""
-    tmp_path = None
+async def preview_file(file: UploadFile = File(...), output_format: str = Query("json", alias="format")):
+    """
+    Genera una vista previa del archivo procesado
+    format: "json" (registros, por defecto) o "arrow" (stream Arrow IPC, requiere pyarrow)
+    """
+    if output_format not in ("json", "arrow"):
+        raise HTTPException(status_code=400, detail=f"Formato de vista previa desconocido: '{output_format}'")
+    if output_format == "arrow" and pa is None:
+        raise HTTPException(status_code=400, detail="El formato arrow requiere pyarrow instalado")
+    
     try:
-        # Guardar archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-        
-        # Procesar
-        processor = ExcelProcessor(tmp_path)
-        processor.read_excel()
-        df_clean = processor.clean_data()
+        with _work_dir() as work_dir:
+            # Guardar archivo temporal
+            tmp_path = await _spool_upload(file, work_dir)
+            
+            # Procesar
+            with ExcelProcessor(tmp_path) as processor:
+                processor.read_excel()
+                df_clean = processor.clean_data()
         
         # Convertir a dict para JSON (primeras 10 filas + última si es totales)
         if len(df_clean) > 10:
@@ -286,14 +455,13 @@ async def preview_file(file: UploadFile = File(...)):
         else:
             preview_df = df_clean
         
-        # Convertir NaN a None para JSON
-        preview_data = preview_df.fillna('').to_dict('records')
-        columns = df_clean.columns.tolist()
         total_rows = len(df_clean) - 1  # -1 por la fila de totales
+        if output_format == "arrow":
+            return Response(content=_preview_arrow(preview_df, total_rows), media_type=ARROW_STREAM_MEDIA_TYPE)
         
-        # Limpiar
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        # Convertir NaN a '' para JSON
+        preview_data = _preview_records(preview_df)
+        columns = df_clean.columns.tolist()
         
         return {
             "success": True,
@@ -303,8 +471,6 @@ async def preview_file(file: UploadFile = File(...)):
             "columns_kept": len(columns)
         }
     except Exception as e:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -334,7 +500,7 @@ async def create_client(
         
         # Crear cliente en Drive
         print(f"\n📁 Creando estructura en Drive...")
-        result = drive_handler.create_client(client_name, cuit)
+        result = await _drive_call(drive_handler.create_client, client_name, cuit)
         
         if not result['success']:
             # Si el cliente ya existe en Drive, preguntamos si solo quiere agregarlo al mapeo
@@ -344,10 +510,11 @@ async def create_client(
                 
                 # Verificar que tenga la estructura correcta
                 try:
-                    structure = drive_handler.get_client_structure(client_name)
+                    structure = await _drive_call(drive_handler.get_client_structure, client_name)
                     if structure['ventas_id'] and structure['compras_id']:
                         # Todo OK, agregar al mapeo
                         cuit_mapper.add_client(cuit, client_name)
+                        cuit_mapper.flush()
                         print(f"   ✓ Cliente agregado al mapeo")
                         
                         return {
@@ -367,6 +534,7 @@ async def create_client(
         # Guardar en el mapeo
         print(f"\n💾 Guardando en mapeo CUIT...")
         cuit_mapper.add_client(cuit, client_name)
+        cuit_mapper.flush()
         print(f"   ✓ Guardado en cuit_mapping.json")
         
         # Verificar que se guardó
@@ -424,16 +592,14 @@ async def edit_client(
                 )
         
         # Eliminar el viejo
-        all_clients = cuit_mapper.get_all_clients()
-        if old_cuit in all_clients:
-            del all_clients[old_cuit]
+        if old_cuit != new_cuit:
+            cuit_mapper.remove_client(old_cuit)
         
         # Agregar el nuevo
-        all_clients[new_cuit] = new_name
+        cuit_mapper.add_client(new_cuit, new_name)
         
         # Guardar
-        cuit_mapper.mapping = all_clients
-        cuit_mapper.save_mapping()
+        cuit_mapper.flush()
         
         print(f"   ✓ Cliente actualizado")
         print(f"\n{'='*60}")
@@ -459,46 +625,42 @@ async def edit_client(
 @app.post("/api/auto-detect-all")
 async def auto_detect_all(file: UploadFile = File(...)):
     """Detecta automáticamente: cliente (por CUIT), tipo, mes y año"""
-    tmp_path = None
     try:
         print(f"\n{'='*60}")
         print(f"AUTO-DETECTAR TODO")
         print(f"{'='*60}\n")
         
-        # Guardar archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
+        with _work_dir() as work_dir:
+            # Guardar archivo temporal
+            tmp_path = await _spool_upload(file, work_dir)
         
-        print(f"📁 Archivo guardado: {tmp_path}")
+            print(f"📁 Archivo guardado: {tmp_path}")
         
-        # Procesar
-        processor = ExcelProcessor(tmp_path)
+            # Procesar
+            with ExcelProcessor(tmp_path) as processor:
+                # Una sola lectura del Excel: read_excel guarda la primera fila
+                # (CUIT y tipo) y deja la columna Fecha lista para detect_month
+                processor.read_excel(mode="stream")
         
-        # Detectar info del header (CUIT y tipo)
-        print(f"\n🔍 Detectando CUIT y tipo...")
-        header_info = processor.detect_info_from_header()
+                # Detectar info del header (CUIT y tipo)
+                print(f"\n🔍 Detectando CUIT y tipo...")
+                header_info = processor.detect_info_from_header()
         
-        # Buscar cliente por CUIT
-        print(f"\n👤 Buscando cliente con CUIT {header_info['cuit']}...")
-        client_name = cuit_mapper.get_client_by_cuit(header_info['cuit'])
-        
-        if client_name:
-            print(f"   ✓ Cliente encontrado: {client_name}")
-        else:
-            print(f"   ⚠️  Cliente no encontrado en mapeo")
+                # Buscar cliente por CUIT
+                print(f"\n👤 Buscando cliente con CUIT {header_info['cuit']}...")
+                client_name = cuit_mapper.get_client_by_cuit(header_info['cuit'])
         
-        # Detectar mes y año
-        print(f"\n📅 Detectando mes y año...")
-        processor.read_excel()
-        month, year = processor.detect_month()
-        month_name = processor.get_month_name(month)
+                if client_name:
+                    print(f"   ✓ Cliente encontrado: {client_name}")
+                else:
+                    print(f"   ⚠️  Cliente no encontrado en mapeo")
         
-        print(f"   ✓ Detectado: {month_name} {year}")
+                # Detectar mes y año
+                print(f"\n📅 Detectando mes y año...")
+                month, year = processor.detect_month()
+                month_name = processor.get_month_name(month)
         
-        # Limpiar
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+                print(f"   ✓ Detectado: {month_name} {year}")
         
         print(f"\n{'='*60}")
         print(f"✅ DETECCIÓN COMPLETADA")
@@ -519,30 +681,50 @@ async def auto_detect_all(file: UploadFile = File(...)):
         import traceback
         traceback.print_exc()
         
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/health")
 async def health_check():
     """Verifica el estado de la API y la conexión con Drive"""
+    now = time.monotonic()
+    if now < _health_cache['expires']:
+        return _health_cache['response']
+    
     try:
-        drive_handler.authenticate()
-        clients_count = len(cuit_mapper.get_all_clients())
-        return {
+        await _drive_call(drive_handler.authenticate)
+        cuit_mapper.refresh()
+        clients_count = len(cuit_mapper.mapping)
+        response = {
             "status": "healthy",
             "drive_connected": True,
             "clients_count": clients_count
         }
     except Exception as e:
-        return {
+        response = {
             "status": "degraded",
             "drive_connected": False,
             "error": str(e)
         }
+    
+    _health_cache['response'] = response
+    _health_cache['expires'] = now + HEALTH_CACHE_TTL
+    return response
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    
+    # uvloop y httptools vienen con uvicorn[standard]; uvloop no existe en Windows
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop=loop, http=http)
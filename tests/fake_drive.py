@@ -0,0 +1,131 @@
+"""
+Servicio de Drive en memoria para los tests de DriveHandler
+Entiende el subconjunto de queries que usa el handler: "'id' in parents",
+name=/mimeType= , "name contains" (por prefijo de palabra, como Drive), trashed
+y combinaciones con and / or / paréntesis
+"""
+
+import re
+import threading
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+FOLDER = 'application/vnd.google-apps.folder'
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_LITERAL = r"'(?:[^'\\]|\\.)*'"
+_TERM_RX = re.compile(
+    rf"({_LITERAL})\s+in\s+parents"
+    rf"|(name|mimeType)\s*=\s*({_LITERAL})"
+    rf"|name\s+contains\s+({_LITERAL})"
+    r"|trashed\s*=\s*(true|false)"
+)
+_WORD_RX = re.compile(r'[^\W_]+')
+
+
+def _name_contains(name: str, value: str) -> bool:
+    """Drive compara por prefijo de cada palabra del nombre, no por subcadena"""
+    value = value.lower()
+    return name.lower().startswith(value) or any(
+        word.startswith(value) for word in _WORD_RX.findall(name.lower())
+    )
+
+
+def _compile_query(q: str):
+    """Traduce la query de Drive a una función f(archivo) -> bool"""
+    def term(match):
+        parent, field, value, contains, trashed = match.groups()
+        if parent:
+            return f"({parent} in f['parents'])"
+        if field:
+            return f"(f[{field!r}] == {value})"
+        if contains:
+            return f"_name_contains(f['name'], {contains})"
+        return f"(f['trashed'] is {trashed == 'true'})"
+
+    code = compile(_TERM_RX.sub(term, q), '<drive-query>', 'eval')
+    return lambda f: eval(code, {'_name_contains': _name_contains}, {'f': f})
+
+
+def http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), b'{"error": "fake"}')
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, num_retries=0):
+        return self._fn()
+
+
+class _Files:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def list(self, q='', fields=None, pageSize=100, **kwargs):
+        def run():
+            self._drive.calls.append(('list', q))
+            match = _compile_query(q)
+            items = [dict(f) for f in self._drive.files.values() if match(f)]
+            if 'orderBy' in kwargs:
+                items.sort(key=lambda f: f['name'])
+            return {'files': items[:pageSize]}
+        return _Request(run)
+
+    def list_next(self, request, results):
+        return None
+
+    def get(self, fileId, fields=None, **kwargs):
+        def run():
+            self._drive.calls.append(('get', fileId))
+            if fileId not in self._drive.files:
+                raise http_error(404)
+            return dict(self._drive.files[fileId])
+        return _Request(run)
+
+
+class FakeDrive:
+    """Árbol de archivos en memoria con la forma de recurso de Drive v3"""
+
+    def __init__(self):
+        self.files = {}
+        self.calls = []
+        self._ids = 0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, parent: str = None, mime_type: str = FOLDER) -> str:
+        with self._lock:
+            self._ids += 1
+            file_id = f'id{self._ids}'
+        self.files[file_id] = {
+            'id': file_id, 'name': name, 'mimeType': mime_type,
+            'parents': [parent] if parent else [], 'trashed': False,
+            'md5Checksum': f'md5-{file_id}', 'modifiedTime': '2025-01-01T00:00:00Z', 'size': '10',
+        }
+        return file_id
+
+    def add_client(self, root_id: str, name: str, ventas: bool = True, compras: bool = True):
+        """Carpeta de cliente con sus subcarpetas Ventas/Compras"""
+        client_id = self.add(name, root_id)
+        ventas_id = self.add('Ventas', client_id) if ventas else None
+        compras_id = self.add('Compras', client_id) if compras else None
+        return client_id, ventas_id, compras_id
+
+    def files_api(self):
+        """Equivalente a service.files() de googleapiclient"""
+        return _Files(self)
+
+
+def make_handler(drive: FakeDrive, cache_path=None):
+    """DriveHandler conectado al servicio falso (sin OAuth ni red)"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from drive_handler import DriveHandler
+
+    handler = DriveHandler(cache_path=cache_path, workbook_cache_dir=None)
+    handler.service = type('Service', (), {'files': lambda self: drive.files_api()})()
+    handler._auth_expires_at = time.monotonic() + 3600
+    handler._executor = ThreadPoolExecutor(max_workers=2)
+    return handler
@@ -0,0 +1,84 @@
+"""
+Utilidades compartidas por los tests: rutas de importación y Excels de prueba
+con el formato de "Mis Comprobantes" de AFIP
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import openpyxl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Mismos nombres de módulo que usa fastapi_app (excel_processor, drive_handler, cuit_mapper)
+for path in (ROOT, os.path.join(ROOT, 'Utils')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+HEADER = [
+    "Fecha", "Tipo", "Punto de Venta", "Número Desde", "Número Hasta", "Cód. Autorización",
+    "Tipo Doc. Receptor", "Nro. Doc. Receptor", "Denominación Receptor", "Tipo Cambio", "Moneda",
+    "Imp. Neto Gravado", "Imp. Neto No Gravado", "Imp. Op. Exentas", "Otros Tributos", "IVA",
+    "Imp. Total",
+]
+
+TIPOS = ["1 - Factura A", "6 - Factura B", "3 - Nota de Crédito A", "8 - Nota de Crédito B"]
+
+
+def write_comprobantes(path: str, rows: int = 20, title: str = "Mis Comprobantes Emitidos - CUIT 30716820080",
+                       month: int = 3, year: int = 2025, date_as_text: bool = True):
+    """
+    Guarda en path un Excel como el que descarga AFIP: título con el CUIT en la
+    primera fila, encabezados en la segunda y una fila por comprobante
+    Returns: path
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([title])
+    ws.append(HEADER)
+    for i in range(rows):
+        fecha = datetime(year, month, i % 28 + 1)
+        tipo_cambio = 1050.5 if i % 5 == 0 else 1.0
+        neto = 100.0 + i * 10.25
+        if i % 7 == 6:
+            # Nota de Crédito que ya viene en negativo desde el sistema
+            neto = -neto
+        iva = round(neto * 0.21, 2)
+        ws.append([
+            fecha.strftime('%d/%m/%Y') if date_as_text else fecha,
+            TIPOS[i % len(TIPOS)], 3, 1000 + i, 1000 + i, f"7500000000{i}", 80,
+            20123456789 + i, f"Cliente {i % 3}", tipo_cambio,
+            "DOL" if tipo_cambio != 1.0 else "PES",
+            neto, None, 0, None, iva, round(neto + iva, 2),
+        ])
+    wb.save(path)
+    wb.close()
+    return path
+
+
+_app_module = None
+
+
+def import_app():
+    """
+    Importa fastapi_app una sola vez, sin tocar el repo: monta "static" y usa
+    cuit_mapping.json relativos al directorio actual, así que se importa desde
+    una carpeta temporal con el mapeo apuntando ahí
+    Returns: el módulo fastapi_app
+    """
+    global _app_module
+    if _app_module is None:
+        import tempfile
+        import cuit_mapper
+
+        work_dir = tempfile.mkdtemp(prefix='iva_tests_')
+        os.mkdir(os.path.join(work_dir, 'static'))
+        cuit_mapper.CUIT_MAP_FILE = os.path.join(work_dir, 'cuit_mapping.json')
+        previous_cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            import fastapi_app
+        finally:
+            os.chdir(previous_cwd)
+        _app_module = fastapi_app
+    return _app_module
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from helpers import write_comprobantes
+
+import excel_processor
+from excel_processor import ExcelProcessor
+
+
+class CleanDataConcurrencyTest(unittest.TestCase):
+    """clean_data corre en los hilos del threadpool de FastAPI: dos requests a la vez"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.paths = [
+            write_comprobantes(os.path.join(self.work_dir, f'entrada{i}.xlsx'), rows=40 + i)
+            for i in range(2)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _clean(self, path):
+        with ExcelProcessor(path) as processor:
+            return processor.clean_data()
+
+    def test_two_threads_at_once(self):
+        # Resultado de referencia con la versión numpy del cálculo
+        with mock.patch.object(excel_processor, '_scale_and_total', excel_processor._scale_and_total_numpy):
+            expected = [self._clean(path) for path in self.paths]
+
+        barrier = threading.Barrier(len(self.paths))
+        results = [None] * len(self.paths)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                results[index] = self._clean(self.paths[index])
+            except Exception as e:  # pragma: no cover - se informa abajo
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(self.paths))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+            self.assertFalse(thread.is_alive(), "clean_data quedó bloqueado en un hilo")
+
+        self.assertEqual(errors, [])
+        for result, reference in zip(results, expected):
+            self.assertTrue(result.equals(reference))
+
+    def test_kernel_from_several_threads(self):
+        # Bloques grandes para que las llamadas se solapen de verdad
+        rng = np.random.default_rng(0)
+        block = rng.uniform(-1000, 1000, size=(200_000, 8))
+        tipo_cambio = rng.choice([1.0, 1050.5], size=block.shape[0])
+        is_nota_credito = rng.random(block.shape[0]) < 0.2
+        expected_block = block.copy()
+        expected = excel_processor._scale_and_total_numpy(expected_block, tipo_cambio, is_nota_credito)
+
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(20):
+                    data = block.copy()
+                    totals = excel_processor._scale_and_total(data, tipo_cambio, is_nota_credito)
+                    np.testing.assert_allclose(totals, expected)
+                    np.testing.assert_array_equal(data, expected_block)
+            except Exception as e:  # pragma: no cover - se informa abajo
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=120)
+            self.assertFalse(thread.is_alive(), "el cálculo quedó bloqueado en un hilo")
+        self.assertEqual(errors, [])
+
+    def test_credit_notes_and_totals(self):
+        df = self._clean(self.paths[0])
+        body, totals = df.iloc[:-1], df.iloc[-1]
+        es_nc = body['Tipo'].astype(str).str.contains('Nota de Crédito')
+        # Las Notas de Crédito quedan en negativo y el resto conserva el signo
+        self.assertTrue((body.loc[es_nc, 'Imp. Neto Gravado'] < 0).all())
+        self.assertAlmostEqual(totals['Imp. Total'], body['Imp. Total'].sum())
+        # Columnas vacías o en cero después de Moneda se eliminan
+        self.assertNotIn('Imp. Neto No Gravado', df.columns)
+        self.assertNotIn('Imp. Op. Exentas', df.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from helpers import import_app
+
+import cuit_mapper
+from cuit_mapper import CUITMapper
+
+
+class ClientsEndpointTest(unittest.TestCase):
+    """/api/clients devuelve bytes ya serializados: tienen que respetar ClientsResponse"""
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        self.app = import_app()
+        # Sin "with": no corre el evento startup (que autentica contra Drive)
+        self.client = TestClient(self.app.app)
+        self.work_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(cuit_mapper, 'CUIT_MAP_FILE', os.path.join(self.work_dir, 'cuit_mapping.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mapper = CUITMapper()
+        self.mapper.add_client('30716820080', 'Zeta')
+        self.mapper.add_client('20123456789', 'acme')
+        for patcher in (mock.patch.object(self.app, 'cuit_mapper', self.mapper),
+                        mock.patch.dict(self.app._clients_cache, {'version': None, 'body': b''})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _get_clients(self):
+        response = self.client.get('/api/clients')
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.headers['content-type'], 'application/json')
+        return self.app.ClientsResponse.model_validate_json(response.content)
+
+    def test_body_matches_clients_response(self):
+        body = self._get_clients()
+        self.assertTrue(body.success)
+        self.assertEqual([(c.id, c.name, c.enabled) for c in body.clients],
+                         [('20123456789', 'acme', True), ('30716820080', 'Zeta', True)])
+
+    def test_body_follows_mapping_changes(self):
+        self._get_clients()
+        self.mapper.add_client('27111222333', 'Beta')
+        self.assertEqual([c.name for c in self._get_clients().clients], ['acme', 'Beta', 'Zeta'])
+
+    def test_openapi_documents_clients_response(self):
+        responses = self.app.app.openapi()['paths']['/api/clients']['get']['responses']
+        schema = responses['200']['content']['application/json']['schema']
+        self.assertEqual(schema, {'$ref': '#/components/schemas/ClientsResponse'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import helpers  # noqa: F401  (rutas de importación)
+
+import cuit_mapper
+from cuit_mapper import CUITMapper
+
+
+class CUITMapperTestCase(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, 'cuit_mapping.json')
+        patcher = mock.patch.object(cuit_mapper, 'CUIT_MAP_FILE', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class SaveMappingTest(CUITMapperTestCase):
+    def test_add_is_written_on_flush(self):
+        mapper = CUITMapper()
+        mapper.add_client('30716820080', 'Zeta')
+        mapper.add_client('20123456789', 'acme')
+        self.assertFalse(os.path.exists(self.path))
+
+        mapper.flush()
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'30716820080': 'Zeta', '20123456789': 'acme'})
+        self.assertEqual(CUITMapper().get_client_by_cuit('30716820080'), 'Zeta')
+
+    def test_flush_without_changes_does_not_write(self):
+        mapper = CUITMapper()
+        with mock.patch.object(mapper, 'save_mapping') as save_mapping:
+            mapper.flush()
+        save_mapping.assert_not_called()
+
+    def test_context_manager_flushes(self):
+        with CUITMapper() as mapper:
+            mapper.add_client('30716820080', 'Zeta')
+        self.assertEqual(CUITMapper().get_all_clients(), {'30716820080': 'Zeta'})
+
+    def test_failed_write_keeps_previous_file(self):
+        with CUITMapper() as mapper:
+            mapper.add_client('30716820080', 'Zeta')
+        mapper.add_client('20123456789', 'acme')
+        # Un corte en el reemplazo no deja el JSON truncado
+        with mock.patch.object(cuit_mapper.os, 'replace', side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                mapper.flush()
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'30716820080': 'Zeta'})
+
+
+class ReverseIndexTest(CUITMapperTestCase):
+    def test_lookup_by_client_name(self):
+        mapper = CUITMapper()
+        mapper.add_client('30716820080', 'Zeta')
+        mapper.add_client('20123456789', 'acme')
+        self.assertEqual(mapper.get_cuit_by_client('acme'), '20123456789')
+        self.assertIsNone(mapper.get_cuit_by_client('ACME'))
+
+    def test_duplicate_name_keeps_first_cuit(self):
+        # Igual que la búsqueda lineal original: gana el primer CUIT del mapeo
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'1': 'Repetido', '2': 'Repetido'}, f)
+        self.assertEqual(CUITMapper().get_cuit_by_client('Repetido'), '1')
+
+    def test_rename_updates_index(self):
+        mapper = CUITMapper()
+        mapper.add_client('2', 'Alfa')
+        mapper.add_client('2', 'Delta')
+        self.assertIsNone(mapper.get_cuit_by_client('Alfa'))
+        self.assertEqual(mapper.get_cuit_by_client('Delta'), '2')
+
+
+class RefreshTest(CUITMapperTestCase):
+    def _write_externally(self, mapping):
+        """Edición a mano del JSON, con un mtime distinto al que vio el mapper"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_refresh_picks_up_external_edit(self):
+        with CUITMapper() as mapper:
+            mapper.add_client('30716820080', 'Zeta')
+        version = mapper.version
+
+        self._write_externally({'30716820080': 'Zeta', '27111222333': 'Beta'})
+        self.assertEqual(mapper.get_client_by_cuit('27111222333'), 'Beta')
+        self.assertEqual(mapper.get_cuit_by_client('Beta'), '27111222333')
+        self.assertGreater(mapper.version, version)
+
+    def test_unchanged_file_is_not_read_again(self):
+        with CUITMapper() as mapper:
+            mapper.add_client('30716820080', 'Zeta')
+        with mock.patch.object(mapper, 'load_mapping') as load_mapping:
+            mapper.get_all_clients()
+            mapper.client_exists('30716820080')
+        load_mapping.assert_not_called()
+
+    def test_refresh_keeps_unsaved_changes(self):
+        mapper = CUITMapper()
+        mapper.add_client('30716820080', 'Zeta')
+        self._write_externally({'27111222333': 'Beta'})
+
+        self.assertEqual(mapper.get_all_clients(), {'30716820080': 'Zeta'})
+        mapper.flush()
+        self.assertEqual(CUITMapper().get_all_clients(), {'30716820080': 'Zeta'})
+
+
+class SortedClientsTest(CUITMapperTestCase):
+    def test_sorted_case_insensitive(self):
+        mapper = CUITMapper()
+        mapper.add_client('30716820080', 'Zeta')
+        mapper.add_client('20123456789', 'acme')
+        mapper.add_client('27111222333', 'Beta')
+        self.assertEqual(mapper.get_sorted_clients(),
+                         [('20123456789', 'acme'), ('27111222333', 'Beta'), ('30716820080', 'Zeta')])
+
+    def test_order_kept_through_rename_and_remove(self):
+        mapper = CUITMapper()
+        mapper.add_client('1', 'Bravo')
+        mapper.add_client('2', 'Alfa')
+        mapper.add_client('3', 'Charlie')
+        mapper.add_client('2', 'Delta')
+        self.assertEqual(mapper.get_sorted_clients(), [('1', 'Bravo'), ('3', 'Charlie'), ('2', 'Delta')])
+
+        mapper.remove_client('1')
+        mapper.remove_client('no-existe')
+        self.assertEqual(mapper.get_sorted_clients(), [('3', 'Charlie'), ('2', 'Delta')])
+        self.assertIsNone(mapper.get_cuit_by_client('Bravo'))
+
+    def test_loaded_mapping_is_sorted(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'2': 'beta', '1': 'Alfa'}, f)
+        self.assertEqual(CUITMapper().get_sorted_clients(), [('1', 'Alfa'), ('2', 'beta')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import helpers  # noqa: F401  (rutas de importación)
+from fake_drive import FakeDrive, XLSX, make_handler
+
+import drive_handler
+from drive_handler import DriveHandler
+
+
+class DriveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.root_id = self.drive.add(DriveHandler.ROOT_FOLDER_NAME)
+        self.handler = make_handler(self.drive)
+
+    def tearDown(self):
+        self.handler._executor.shutdown()
+
+
+class CheckYearFilesBulkTest(DriveTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.acme_ventas, _ = self.drive.add_client(self.root_id, 'ACME')
+        _, _, self.beta_compras = self.drive.add_client(self.root_id, 'Beta')
+        self.acme_file = self.drive.add('Libro Iva Ventas 2025 ACME.xlsx', self.acme_ventas, XLSX)
+        self.beta_file = self.drive.add('Libro Iva Compras 2025 Beta.xlsx', self.beta_compras, XLSX)
+        # Mismo nombre pero en otra carpeta: no debe confundirse con el de ACME
+        self.drive.add('Libro Iva Ventas 2025 Beta.xlsx', self.beta_compras, XLSX)
+
+    def test_batch_results_by_folder_and_name(self):
+        jobs = [('ACME', 'ventas', 2025), ('ACME', 'compras', 2025),
+                ('Beta', 'compras', 2025), ('Beta', 'ventas', 2025)]
+        status = self.handler.check_year_files_bulk(jobs)
+
+        self.assertEqual(set(status), set(jobs))
+        self.assertTrue(status[('ACME', 'ventas', 2025)]['exists'])
+        self.assertEqual(status[('ACME', 'ventas', 2025)]['file_id'], self.acme_file)
+        self.assertEqual(status[('ACME', 'ventas', 2025)]['metadata']['md5Checksum'], f'md5-{self.acme_file}')
+        self.assertEqual(status[('Beta', 'compras', 2025)]['file_id'], self.beta_file)
+        self.assertFalse(status[('ACME', 'compras', 2025)]['exists'])
+        self.assertFalse(status[('Beta', 'ventas', 2025)]['exists'])
+        self.assertEqual(status[('Beta', 'ventas', 2025)]['filename'], 'Libro Iva Ventas 2025 Beta.xlsx')
+        self.assertIsNone(status[('ACME', 'ventas', 2025)]['error'])
+        # Los libros de todos los clientes salen de una sola consulta agrupada
+        file_queries = [q for kind, q in self.drive.calls if kind == 'list' and 'Libro Iva' in q]
+        self.assertEqual(len(file_queries), 1)
+
+    def test_batches_split_by_parent_folders(self):
+        names = [f'Cliente {i}' for i in range(5)]
+        for name in names:
+            _, ventas, _ = self.drive.add_client(self.root_id, name)
+            if name != 'Cliente 3':
+                self.drive.add(f'Libro Iva Ventas 2025 {name}.xlsx', ventas, XLSX)
+        self.handler.BULK_PARENTS_PER_QUERY = 2
+
+        self.drive.calls.clear()
+        status = self.handler.check_year_files_bulk([(name, 'ventas', 2025) for name in names])
+
+        # 5 carpetas de a 2 por consulta: 3 consultas de libros
+        file_queries = [q for kind, q in self.drive.calls if kind == 'list' and 'Libro Iva' in q]
+        self.assertEqual(len(file_queries), 3)
+        self.assertEqual([status[(name, 'ventas', 2025)]['exists'] for name in names],
+                         [True, True, True, False, True])
+        self.assertEqual(len({status[(name, 'ventas', 2025)]['file_id'] for name in names if name != 'Cliente 3'}), 4)
+
+    def test_missing_client_folder_is_reported_per_client(self):
+        jobs = [('ACME', 'ventas', 2025), ('Renombrado', 'ventas', 2025)]
+        status = self.handler.check_year_files_bulk(jobs, strict=False)
+
+        self.assertTrue(status[('ACME', 'ventas', 2025)]['exists'])
+        missing = status[('Renombrado', 'ventas', 2025)]
+        self.assertFalse(missing['exists'])
+        self.assertIsNone(missing['folder_id'])
+        self.assertIn('Renombrado', missing['error'])
+
+    def test_missing_client_folder_raises_when_strict(self):
+        with self.assertRaises(Exception):
+            self.handler.check_year_files_bulk([('Renombrado', 'ventas', 2025)])
+
+
+class StaleFolderCacheTest(DriveTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.drive = FakeDrive()
+        self.root_id = self.drive.add(DriveHandler.ROOT_FOLDER_NAME)
+        self.client_id, self.ventas_id, _ = self.drive.add_client(self.root_id, 'ACME')
+        self.cache_path = os.path.join(self.cache_dir, 'cache.json')
+        self.handler = make_handler(self.drive, cache_path=self.cache_path)
+        # Primera consulta: la estructura queda cacheada (en memoria y en disco)
+        self.assertFalse(self.handler.check_year_file_exists('ACME', 'ventas', 2025)['exists'])
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _recreate_ventas(self):
+        new_ventas = self.drive.add('Ventas', self.client_id)
+        file_id = self.drive.add('Libro Iva Ventas 2025 ACME.xlsx', new_ventas, XLSX)
+        return new_ventas, file_id
+
+    def _assert_cached_folder(self, new_ventas):
+        # Un handler nuevo usaría el cache de disco: tiene que arrancar con la carpeta nueva
+        with open(self.cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        self.assertEqual(cached[f'{self.root_id}/ACME']['ventas_id'], new_ventas)
+
+    def test_trashed_folder_is_resolved_again(self):
+        self.drive.files[self.ventas_id]['trashed'] = True
+        new_ventas, file_id = self._recreate_ventas()
+
+        result = self.handler.check_year_file_exists('ACME', 'ventas', 2025)
+        self.assertTrue(result['exists'])
+        self.assertEqual(result['file_id'], file_id)
+        self.assertEqual(result['folder_id'], new_ventas)
+        self._assert_cached_folder(new_ventas)
+
+    def test_deleted_folder_is_resolved_again(self):
+        del self.drive.files[self.ventas_id]
+        new_ventas, _ = self._recreate_ventas()
+
+        result = self.handler.check_year_file_exists('ACME', 'ventas', 2025)
+        self.assertTrue(result['exists'])
+        self.assertEqual(result['folder_id'], new_ventas)
+        self._assert_cached_folder(new_ventas)
+
+    def test_missing_file_in_live_folder(self):
+        self.drive.calls.clear()
+        result = self.handler.check_year_file_exists('ACME', 'ventas', 2026)
+        self.assertFalse(result['exists'])
+        self.assertEqual(result['folder_id'], self.ventas_id)
+        # Una búsqueda y una verificación de la carpeta, sin volver a resolver la estructura
+        self.assertEqual([kind for kind, _ in self.drive.calls], ['list', 'get'])
+
+
+class FindClientByCuitTest(DriveTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dashed = self.drive.add('20-12345678-9 Cliente', self.root_id)
+        self.plain = self.drive.add('Beta 30716820080', self.root_id)
+        self.drive.add('20123456780 Otro', self.root_id)
+        self.drive.add('201234567891 Largo', self.root_id)
+
+    def test_digits_match_formatted_folder_name(self):
+        result = self.handler.find_client_by_cuit('20123456789')
+        self.assertTrue(result['found'])
+        self.assertEqual(result['client_name'], '20-12345678-9 Cliente')
+        self.assertEqual(result['client_id'], self.dashed)
+
+    def test_formatted_cuit_matches_plain_folder_name(self):
+        result = self.handler.find_client_by_cuit('30-71682008-0')
+        self.assertEqual(result['client_id'], self.plain)
+        self.assertEqual(result['cuit'], '30-71682008-0')
+
+    def test_prefix_or_unknown_cuit_does_not_match(self):
+        for cuit in ('2012', '20123456', '27111222333'):
+            result = self.handler.find_client_by_cuit(cuit)
+            self.assertFalse(result['found'], cuit)
+            self.assertIsNone(result['client_name'])
+
+
+class WorkbookCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.work_dir, 'libros')
+        self.handler = DriveHandler(cache_path=None, workbook_cache_dir=self.cache_dir)
+        self.content = b'contenido del libro'
+        self.metadata = {'id': 'libro', 'md5Checksum': hashlib.md5(self.content).hexdigest()}
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _fetch(self, metadata=None):
+        output = io.BytesIO()
+        return self.handler.fetch_cached_workbook('libro', output, metadata or self.metadata), output.getvalue()
+
+    def test_cached_copy_is_reused(self):
+        self.handler.store_cached_workbook('libro', io.BytesIO(self.content), self.metadata)
+        self.assertEqual(self._fetch(), (True, self.content))
+        # El índice sobrevive a un handler nuevo
+        handler = DriveHandler(cache_path=None, workbook_cache_dir=self.cache_dir)
+        output = io.BytesIO()
+        self.assertTrue(handler.fetch_cached_workbook('libro', output, self.metadata))
+
+    @unittest.skipIf(os.name == 'nt', "sin permisos POSIX")
+    def test_cache_dir_is_private(self):
+        os.mkdir(self.cache_dir, 0o755)
+        self.handler.store_cached_workbook('libro', io.BytesIO(self.content), self.metadata)
+        self.assertEqual(os.stat(self.cache_dir).st_mode & 0o777, 0o700)
+
+    def test_tampered_copy_is_discarded(self):
+        self.handler.store_cached_workbook('libro', io.BytesIO(self.content), self.metadata)
+        with open(os.path.join(self.cache_dir, 'libro.xlsx'), 'wb') as f:
+            f.write(b'otro contenido')
+        self.assertEqual(self._fetch(), (False, b''))
+        self.assertNotIn('libro', self.handler._workbook_cache)
+
+    def test_tampered_copy_without_drive_md5(self):
+        # Google Sheets: solo modifiedTime, se verifica contra el md5 guardado
+        metadata = {'id': 'libro', 'modifiedTime': '2025-03-01T00:00:00Z'}
+        self.handler.store_cached_workbook('libro', io.BytesIO(self.content), metadata)
+        self.assertEqual(self._fetch(metadata), (True, self.content))
+        with open(os.path.join(self.cache_dir, 'libro.xlsx'), 'wb') as f:
+            f.write(b'otro contenido')
+        self.assertFalse(self._fetch(metadata)[0])
+
+    def test_content_not_matching_drive_is_not_stored(self):
+        self.handler.store_cached_workbook('libro', io.BytesIO(b'otra version'), self.metadata)
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, 'libro.xlsx')))
+        self.assertFalse(self._fetch()[0])
+
+
+class AuthenticateTest(unittest.TestCase):
+    def test_token_lifetime_from_naive_utc_expiry(self):
+        handler = DriveHandler(token_path=os.path.join(tempfile.gettempdir(), 'sin-token.json'),
+                               cache_path=None, workbook_cache_dir=None)
+        # google-auth guarda expiry como UTC sin zona horaria
+        expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=600)
+        creds = mock.Mock(valid=True, expiry=expiry)
+        with mock.patch.object(drive_handler.os.path, 'exists', return_value=True), \
+                mock.patch.object(drive_handler.Credentials, 'from_authorized_user_file', return_value=creds), \
+                mock.patch.object(drive_handler, 'build'), \
+                mock.patch('builtins.open', mock.mock_open()):
+            service = handler.authenticate()
+            # Con el token vigente no se vuelve a construir el servicio
+            self.assertIs(handler.authenticate(), service)
+        handler._executor.shutdown()
+        self.assertAlmostEqual(handler._auth_expires_at - time.monotonic(), 600, delta=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import openpyxl
+
+from helpers import write_comprobantes
+
+import excel_processor
+from excel_processor import ExcelProcessor, fast_append_sheet
+
+
+def _year_workbook(path: str):
+    """Libro del año con una pestaña ya cargada (como queda después del primer mes)"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Enero'
+    ws.append(['Fecha', 'Imp. Total'])
+    ws.append(['02/01/2025', 10.5])
+    wb.save(path)
+    wb.close()
+    return path
+
+
+def _cell_values(ws):
+    return [list(row) for row in ws.iter_rows(values_only=True)]
+
+
+class FastAppendSheetTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        entrada = write_comprobantes(os.path.join(self.work_dir, 'entrada.xlsx'), rows=15)
+        with ExcelProcessor(entrada) as processor:
+            self.df = processor.clean_data()
+        self.path = _year_workbook(os.path.join(self.work_dir, 'libro.xlsx'))
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _check_sheet(self, wb, name):
+        ws = wb[name]
+        last_row = len(self.df) + 1
+        self.assertEqual(ws.max_row, last_row)
+        self.assertEqual([cell.value for cell in ws[1]], list(self.df.columns))
+        for cell in ws[1]:
+            self.assertTrue(cell.font.bold)
+            self.assertEqual(cell.alignment.horizontal, 'center')
+        for cell in ws[last_row]:
+            self.assertTrue(cell.font.bold)
+        for cell in ws[2]:
+            self.assertFalse(cell.font.bold)
+
+    def test_round_trip_with_openpyxl(self):
+        self.assertEqual(fast_append_sheet(self.path, 'Febrero', self.df), "success")
+        self.assertEqual(fast_append_sheet(self.path, 'Marzo', self.df), "success")
+
+        wb = openpyxl.load_workbook(self.path)
+        try:
+            self.assertEqual(wb.sheetnames, ['Enero', 'Febrero', 'Marzo'])
+            self.assertEqual(_cell_values(wb['Enero']), [['Fecha', 'Imp. Total'], ['02/01/2025', 10.5]])
+            self._check_sheet(wb, 'Febrero')
+            self._check_sheet(wb, 'Marzo')
+        finally:
+            wb.close()
+
+    def test_same_cells_as_openpyxl_path(self):
+        reference = os.path.join(self.work_dir, 'referencia.xlsx')
+        shutil.copy(self.path, reference)
+        processor = ExcelProcessor(None)
+        with mock.patch.object(excel_processor, 'fast_append_sheet', return_value="unsupported"):
+            self.assertEqual(processor.add_sheet_to_workbook(reference, 'Febrero', self.df), "success")
+        self.assertEqual(processor.add_sheet_to_workbook(self.path, 'Febrero', self.df), "success")
+
+        expected = openpyxl.load_workbook(reference)
+        result = openpyxl.load_workbook(self.path)
+        try:
+            self.assertEqual(_cell_values(result['Febrero']), _cell_values(expected['Febrero']))
+        finally:
+            expected.close()
+            result.close()
+
+    def test_existing_sheet(self):
+        self.assertEqual(fast_append_sheet(self.path, 'Febrero', self.df), "success")
+        with open(self.path, 'rb') as f:
+            before = f.read()
+        self.assertEqual(fast_append_sheet(self.path, 'Febrero', self.df), "exists")
+        self.assertEqual(fast_append_sheet(self.path, 'Enero', self.df), "exists")
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
+    def test_no_orphaned_members(self):
+        for month in ('Febrero', 'Marzo', 'Abril'):
+            fast_append_sheet(self.path, month, self.df)
+        with zipfile.ZipFile(self.path) as zf:
+            self.assertIsNone(zf.testzip())
+            names = zf.namelist()
+            self.assertEqual(len(names), len(set(names)))
+        # Sin copias viejas de las partes reescritas: el archivo mide lo que suman sus miembros
+        with zipfile.ZipFile(self.path) as zf:
+            members = sum(info.compress_size for info in zf.infolist())
+        self.assertLess(os.path.getsize(self.path) - members, 200 * len(names))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_in_memory_buffer(self):
+        with open(self.path, 'rb') as f:
+            buffer = io.BytesIO(f.read())
+        self.assertEqual(fast_append_sheet(buffer, 'Febrero', self.df), "success")
+        self.assertEqual(buffer.tell(), 0)
+        wb = openpyxl.load_workbook(buffer)
+        try:
+            self.assertEqual(wb.sheetnames, ['Enero', 'Febrero'])
+            self._check_sheet(wb, 'Febrero')
+        finally:
+            wb.close()
+
+    def test_new_file_with_temp_sheet_uses_openpyxl(self):
+        wb = openpyxl.Workbook()
+        wb.active.title = '_temp'
+        wb.save(self.path)
+        wb.close()
+        self.assertEqual(fast_append_sheet(self.path, 'Febrero', self.df), "unsupported")
+        self.assertEqual(ExcelProcessor(None).add_sheet_to_workbook(self.path, 'Febrero', self.df), "success")
+        wb = openpyxl.load_workbook(self.path)
+        try:
+            self.assertEqual(wb.sheetnames, ['Febrero'])
+            self._check_sheet(wb, 'Febrero')
+        finally:
+            wb.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from helpers import import_app, write_comprobantes
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+fastapi_app = None
+_work_dir = None
+
+
+def setUpModule():
+    global fastapi_app, _work_dir
+    if pa is not None:
+        fastapi_app = import_app()
+        _work_dir = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    if _work_dir is not None:
+        shutil.rmtree(_work_dir, ignore_errors=True)
+
+
+@unittest.skipIf(pa is None, "pyarrow no está instalado")
+class PreviewArrowTest(unittest.TestCase):
+    def _preview(self):
+        # Misma forma que la salida de clean_data: datos y fila de totales al final
+        df = pd.DataFrame({
+            'Fecha': ['01/03/2025', '02/03/2025', ''],
+            'Tipo': pd.Categorical(['1 - Factura A', '3 - Nota de Crédito A', None]),
+            'Nro. Doc. Receptor': [20123456789, 'CF', ''],
+            'Imp. Total': [121.0, -60.5, 60.5],
+        })
+        df['Imp. Total'] = df['Imp. Total'].astype(np.float64)
+        data = fastapi_app._preview_arrow(df, total_rows=2)
+        return pa.ipc.open_stream(data).read_all()
+
+    def test_schema_and_metadata(self):
+        table = self._preview()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column_names, ['Fecha', 'Tipo', 'Nro. Doc. Receptor', 'Imp. Total'])
+        self.assertEqual(table.schema.metadata, {b'total_rows': b'2'})
+        self.assertEqual(table.schema.field('Imp. Total').type, pa.float64())
+
+    def test_empty_cells_are_nulls(self):
+        table = self._preview()
+        self.assertEqual(table.column('Fecha').to_pylist(), ['01/03/2025', '02/03/2025', None])
+        self.assertEqual(table.column('Tipo').to_pylist(), ['1 - Factura A', '3 - Nota de Crédito A', None])
+        self.assertEqual(table.column('Imp. Total').to_pylist(), [121.0, -60.5, 60.5])
+
+    def test_mixed_column_is_sent_as_text(self):
+        column = self._preview().column('Nro. Doc. Receptor')
+        self.assertEqual(column.type, pa.string())
+        self.assertEqual(column.to_pylist(), ['20123456789', 'CF', None])
+
+
+@unittest.skipIf(pa is None, "pyarrow no está instalado")
+class PreviewEndpointTest(unittest.TestCase):
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        # Sin "with": no corre el evento startup (que autentica contra Drive)
+        self.client = TestClient(fastapi_app.app)
+        self.path = write_comprobantes(os.path.join(_work_dir, 'entrada.xlsx'), rows=15)
+
+    def _post(self, output_format):
+        with open(self.path, 'rb') as f:
+            return self.client.post('/api/preview', params={'format': output_format},
+                                    files={'file': ('entrada.xlsx', f.read())})
+
+    def test_arrow_stream_matches_json_preview(self):
+        arrow = self._post('arrow')
+        self.assertEqual(arrow.status_code, 200)
+        self.assertEqual(arrow.headers['content-type'], fastapi_app.ARROW_STREAM_MEDIA_TYPE)
+        table = pa.ipc.open_stream(arrow.content).read_all()
+
+        preview = self._post('json').json()
+        self.assertEqual(table.column_names, preview['columns'])
+        # 10 filas + la de totales
+        self.assertEqual(table.num_rows, len(preview['preview']))
+        self.assertEqual(table.schema.metadata[b'total_rows'], str(preview['total_rows']).encode())
+        self.assertEqual(table.column('Imp. Total').to_pylist(),
+                         [row['Imp. Total'] for row in preview['preview']])
+
+    def test_unknown_format(self):
+        response = self._post('xml')
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
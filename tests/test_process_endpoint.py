@@ -0,0 +1,114 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import openpyxl
+
+from helpers import import_app, write_comprobantes
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _new_year_file():
+    """Libro del año recién creado (solo la hoja _temp, como create_year_file)"""
+    wb = openpyxl.Workbook()
+    wb.active.title = '_temp'
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    wb.close()
+    return buffer.getvalue()
+
+
+class ProcessEndpointTest(unittest.TestCase):
+    """/api/process con las llamadas a Drive reemplazadas por mocks"""
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        self.app = import_app()
+        # Sin "with": no corre el evento startup (que autentica contra Drive)
+        self.client = TestClient(self.app.app)
+        self.work_dir = tempfile.mkdtemp()
+        self.uploaded = {}
+
+        drive = self.app.drive_handler
+        self.drive = mock.MagicMock()
+        self.drive.check_year_file_exists.return_value = {
+            'exists': False, 'file_id': None, 'mime_type': None, 'folder_id': 'ventas',
+            'filename': 'Libro Iva Ventas 2025 ACME.xlsx', 'metadata': None,
+        }
+        self.drive.create_year_file.return_value = 'nuevo'
+        self.drive.get_metadata.return_value = {'id': 'nuevo', 'md5Checksum': 'x', 'size': '100'}
+        self.drive.fetch_cached_workbook.return_value = False
+        self.drive.download_to_bytesio.side_effect = lambda *a, **k: io.BytesIO(_new_year_file())
+        self.drive.update_file.side_effect = self._update_file
+        for name in ('check_year_file_exists', 'create_year_file', 'get_metadata', 'fetch_cached_workbook',
+                     'store_cached_workbook', 'download_to_bytesio', 'download_file', 'update_file'):
+            patcher = mock.patch.object(drive, name, getattr(self.drive, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _update_file(self, file_id, source, **kwargs):
+        self.uploaded[file_id] = source.getvalue()
+        return file_id
+
+    def _post(self, path, create=True):
+        data = {'client': 'ACME', 'tipo': 'ventas', 'year': 2025, 'month': 3, 'month_name': 'Marzo',
+                'create_if_not_exists': 'true' if create else 'false'}
+        with open(path, 'rb') as f:
+            return self.client.post('/api/process', data=data, files={'file': ('entrada.xlsx', f.read(), XLSX)})
+
+    def test_invalid_upload_does_not_create_year_file(self):
+        # Sin columna Moneda: clean_data falla
+        wb = openpyxl.Workbook()
+        wb.active.append(['Mis Comprobantes Emitidos - CUIT 30716820080'])
+        wb.active.append(['Fecha', 'Tipo'])
+        wb.active.append(['01/03/2025', '1 - Factura A'])
+        path = os.path.join(self.work_dir, 'sin_moneda.xlsx')
+        wb.save(path)
+        wb.close()
+
+        response = self._post(path)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('Moneda', response.json()['detail'])
+        self.drive.check_year_file_exists.assert_called_once()
+        self.drive.create_year_file.assert_not_called()
+        self.drive.update_file.assert_not_called()
+
+    def test_unreadable_upload_does_not_create_year_file(self):
+        path = os.path.join(self.work_dir, 'roto.xlsx')
+        with open(path, 'wb') as f:
+            f.write(b'no es un excel')
+        self.assertEqual(self._post(path).status_code, 500)
+        self.drive.create_year_file.assert_not_called()
+
+    def test_missing_year_file_needs_confirmation(self):
+        path = write_comprobantes(os.path.join(self.work_dir, 'entrada.xlsx'), rows=5)
+        response = self._post(path, create=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['needs_confirmation'])
+        self.drive.create_year_file.assert_not_called()
+
+    def test_valid_upload_creates_and_fills_year_file(self):
+        path = write_comprobantes(os.path.join(self.work_dir, 'entrada.xlsx'), rows=5)
+        response = self._post(path)
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertTrue(response.json()['success'])
+        self.drive.create_year_file.assert_called_once_with('ACME', 'ventas', 2025)
+        self.drive.get_metadata.assert_called_once_with('nuevo')
+
+        wb = openpyxl.load_workbook(io.BytesIO(self.uploaded['nuevo']))
+        try:
+            self.assertEqual(wb.sheetnames, ['Marzo'])
+            self.assertEqual(wb['Marzo'].max_row, 7)
+        finally:
+            wb.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import openpyxl
+
+from helpers import write_comprobantes
+
+import excel_processor
+from excel_processor import ExcelProcessor, _sniff_first_row
+
+
+class ReadExcelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = write_comprobantes(os.path.join(self.work_dir, 'entrada.xlsx'), rows=12)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _read(self, mode="full"):
+        with ExcelProcessor(self.path) as processor:
+            return processor.read_excel(mode=mode)
+
+    def _read_with_openpyxl(self, mode="full"):
+        with mock.patch.object(excel_processor, 'CalamineWorkbook', None):
+            return self._read(mode)
+
+
+@unittest.skipIf(excel_processor.CalamineWorkbook is None, "python-calamine no está instalado")
+class CalamineFallbackTest(ReadExcelTestCase):
+    def test_calamine_and_openpyxl_read_the_same(self):
+        self.assertTrue(self._read().equals(self._read_with_openpyxl()))
+
+    def test_calamine_error_falls_back_to_openpyxl(self):
+        expected = self._read_with_openpyxl()
+        error = excel_processor.CalamineError("xml inválido")
+        with mock.patch.object(excel_processor.CalamineWorkbook, 'from_path', side_effect=error) as from_path:
+            df = self._read()
+        from_path.assert_called_once_with(self.path)
+        self.assertTrue(df.equals(expected))
+
+    def test_other_errors_are_not_hidden(self):
+        with mock.patch.object(excel_processor.CalamineWorkbook, 'from_path', side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                self._read()
+        with mock.patch.object(excel_processor.CalamineWorkbook, 'from_path', side_effect=TypeError("bug")):
+            with self.assertRaises(TypeError):
+                self._read()
+
+
+class SingleWorkbookOpenTest(ReadExcelTestCase):
+    """Encabezado y datos salen de la misma apertura del Excel"""
+
+    def test_openpyxl_opens_the_workbook_once(self):
+        load_workbook = mock.Mock(wraps=excel_processor.openpyxl.load_workbook)
+        with mock.patch.object(excel_processor, 'CalamineWorkbook', None), \
+                mock.patch.object(excel_processor, '_sniff_first_row', return_value=None), \
+                mock.patch.object(excel_processor.openpyxl, 'load_workbook', load_workbook):
+            with ExcelProcessor(self.path) as processor:
+                info = processor.detect_info_from_header()
+                df = processor.read_excel()
+                month, year = processor.detect_month()
+        self.assertEqual(load_workbook.call_count, 1)
+        self.assertEqual(info, {'cuit': '30716820080', 'tipo': 'ventas'})
+        self.assertEqual(len(df), 12)
+        self.assertEqual((month, year), (3, 2025))
+        # read_excel libera el archivo en cuanto tiene todo en memoria
+        self.assertIsNone(processor._wb)
+
+    def test_read_excel_keeps_first_row_for_header(self):
+        with ExcelProcessor(self.path) as processor:
+            processor.read_excel()
+            with mock.patch.object(excel_processor, '_sniff_first_row') as sniff:
+                info = processor.detect_info_from_header()
+        sniff.assert_not_called()
+        self.assertEqual(info['cuit'], '30716820080')
+
+
+# Primera fila con textos en línea (inlineStr) en vez de la tabla de textos compartidos
+_INLINE_SHEET = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+    '<row r="1"><c r="B1" t="inlineStr"><is><t>Mis Comprobantes Recibidos &amp; CUIT 20111222333</t></is></c>'
+    '<c r="D1"><v>42</v></c></row>'
+    '<row r="2"><c r="A2" t="inlineStr"><is><t>Fecha</t></is></c></row>'
+    '</sheetData></worksheet>'
+).encode()
+
+
+class SniffFirstRowTest(unittest.TestCase):
+    """_sniff_first_row tiene que leer lo mismo que openpyxl en las primeras 5 celdas"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _workbook(self, rows, name='libro.xlsx'):
+        wb = openpyxl.Workbook()
+        for row_num, row in enumerate(rows, start=1):
+            for col_num, value in enumerate(row, start=1):
+                if value is not None:
+                    wb.active.cell(row=row_num, column=col_num, value=value)
+        path = os.path.join(self.work_dir, name)
+        wb.save(path)
+        wb.close()
+        return path
+
+    @staticmethod
+    def _as_text(values):
+        values = list(values) + [None] * (5 - len(values))
+        return ['' if value is None else str(value) for value in values[:5]]
+
+    def _openpyxl_first_row(self, path):
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            # list y no next: el generador a medio consumir deja abierto el archivo
+            rows = list(wb.worksheets[0].iter_rows(min_row=1, max_row=1, max_col=5, values_only=True))
+            return rows[0] if rows else ()
+        finally:
+            wb.close()
+
+    def assertSameAsOpenpyxl(self, path):
+        sniffed = _sniff_first_row(path)
+        self.assertIsNotNone(sniffed)
+        self.assertEqual(self._as_text(sniffed), self._as_text(self._openpyxl_first_row(path)))
+
+    def test_afip_header(self):
+        self.assertSameAsOpenpyxl(write_comprobantes(os.path.join(self.work_dir, 'afip.xlsx'), rows=3))
+
+    def test_mixed_cells_and_gaps(self):
+        self.assertSameAsOpenpyxl(self._workbook([
+            [None, 'Razón Social <S.A.> & Cía', 12, 1.5, None, 'sexta columna'],
+            ['Fecha'],
+        ]))
+
+    def test_empty_first_row(self):
+        path = self._workbook([[None], ['Mis Comprobantes Emitidos - CUIT 30716820080']])
+        self.assertEqual(_sniff_first_row(path), [None] * 5)
+        self.assertSameAsOpenpyxl(path)
+
+    def test_inline_strings(self):
+        path = self._workbook([['x']])
+        excel_processor._rewrite_zip(path, {'xl/worksheets/sheet1.xml': _INLINE_SHEET})
+        self.assertSameAsOpenpyxl(path)
+        self.assertEqual(_sniff_first_row(path)[1], 'Mis Comprobantes Recibidos & CUIT 20111222333')
+
+    def test_not_an_xlsx(self):
+        path = os.path.join(self.work_dir, 'roto.xlsx')
+        with open(path, 'wb') as f:
+            f.write(b'no es un zip')
+        self.assertIsNone(_sniff_first_row(path))
+
+    def test_header_detection_uses_sniffed_row(self):
+        path = write_comprobantes(os.path.join(self.work_dir, 'recibidos.xlsx'), rows=3,
+                                  title="Mis Comprobantes Recibidos - CUIT 20111222333")
+        processor = ExcelProcessor(path)
+        with mock.patch.object(excel_processor.openpyxl, 'load_workbook') as load_workbook:
+            info = processor.detect_info_from_header()
+        load_workbook.assert_not_called()
+        self.assertEqual(info, {'cuit': '20111222333', 'tipo': 'compras'})
+
+
+class HeaderFallbackTest(unittest.TestCase):
+    """Si no se puede leer el XML directo, el encabezado sale de openpyxl (solo 5 celdas)"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        wb = openpyxl.Workbook()
+        # El CUIT está en la segunda celda; la sexta no se tiene que mirar
+        wb.active.append([None, 'Mis Comprobantes Emitidos - CUIT 30716820080', None, None, None,
+                          'Mis Comprobantes Recibidos - CUIT 20111222333'])
+        self.path = os.path.join(self.work_dir, 'entrada.xlsx')
+        wb.save(self.path)
+        wb.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _detect(self):
+        with mock.patch.object(excel_processor, '_sniff_first_row', return_value=None):
+            processor = ExcelProcessor(self.path)
+            return processor, processor.detect_info_from_header()
+
+    def test_first_five_cells(self):
+        processor, info = self._detect()
+        processor.close()
+        self.assertEqual(info, {'cuit': '30716820080', 'tipo': 'ventas'})
+        self.assertEqual(len(processor._header_row0), 5)
+
+    @unittest.skipIf(excel_processor.CalamineWorkbook is None, "python-calamine no está instalado")
+    def test_workbook_released_when_calamine_reads_the_data(self):
+        processor, _ = self._detect()
+        self.assertIsNone(processor._wb)
+
+
+class FechaColumnTest(unittest.TestCase):
+    """Las fechas de texto se usan para detectar el mes pero se escriben tal como vinieron"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _write(self, fechas):
+        path = write_comprobantes(os.path.join(self.work_dir, 'entrada.xlsx'), rows=len(fechas))
+        wb = openpyxl.load_workbook(path)
+        for row_num, fecha in enumerate(fechas, start=3):
+            wb.active.cell(row=row_num, column=1, value=fecha)
+        wb.save(path)
+        wb.close()
+        return path
+
+    def test_text_dates_are_kept_as_read(self):
+        fechas = ['1/3/2025', '01/03/2025', '15/3/2025', '2/02/2025']
+        with ExcelProcessor(self._write(fechas)) as processor:
+            df = processor.read_excel()
+            self.assertEqual(df['Fecha'].tolist(), fechas)
+            self.assertEqual(processor.detect_month(), (3, 2025))
+            df_clean = processor.clean_data()
+        self.assertEqual(df_clean['Fecha'].tolist()[:-1], fechas)
+
+    def test_detect_month_reuses_parsed_dates(self):
+        with ExcelProcessor(self._write(['1/3/2025', '2/3/2025'])) as processor:
+            processor.read_excel(mode="stream")
+            with mock.patch.object(excel_processor, '_parse_dates') as parse_dates:
+                self.assertEqual(processor.detect_month(), (3, 2025))
+        parse_dates.assert_not_called()
+
+    def test_datetime_cells_are_formatted(self):
+        path = write_comprobantes(os.path.join(self.work_dir, 'fechas.xlsx'), rows=3, date_as_text=False)
+        with ExcelProcessor(path) as processor:
+            df_clean = processor.clean_data()
+        self.assertEqual(df_clean['Fecha'].tolist()[:-1], ['01/03/2025', '02/03/2025', '03/03/2025'])
+
+
+if __name__ == '__main__':
+    unittest.main()